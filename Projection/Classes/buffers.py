@@ -0,0 +1,23 @@
+import numpy as np
+from math import prod
+
+class BufferPool:
+    """
+    Named numpy arrays that are kept between frames for per-frame working data.
+    A buffer is only reallocated when a frame needs more room than it has, so a steady scene doesn't allocate big arrays every frame.
+    """
+    def __init__(self) -> None:
+        self.buffers: dict[str, np.ndarray] = {}
+
+    def get(self, name: str, shape: tuple, dtype=float) -> np.ndarray:
+        """
+        Returns an uninitialized array with the given shape that reuses the named buffer's memory
+        """
+        size = prod(shape)
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.size < size or buffer.dtype != np.dtype(dtype):
+            # Leave room to grow so a slowly growing scene doesn't reallocate every frame
+            capacity = size if buffer is None else max(size, buffer.size * 2)
+            buffer = np.empty(capacity, dtype=dtype)
+            self.buffers[name] = buffer
+        return buffer[:size].reshape(shape)
@@ -0,0 +1,269 @@
+import numpy as np
+from Classes import camera, shapes
+
+class BVHNode:
+    """
+    A box in the hierarchy. Leaves hold objects, other nodes hold 2 children.
+    The box always contains everything below it.
+    """
+    def __init__(self, parent: "BVHNode" = None) -> None:
+        self.parent = parent
+        self.left: BVHNode = None
+        self.right: BVHNode = None
+        self.objects: list[shapes.Object] = []
+
+        # Empty box, min > max so it never hits anything and doesn't grow its parent
+        self.bounds_min = np.full(3, np.inf)
+        self.bounds_max = np.full(3, -np.inf)
+
+    def is_leaf(self) -> bool:
+        return self.left is None
+
+    def update_bounds(self) -> bool:
+        """
+        Recomputes the box from the node's objects or children.
+        Returns whether the box changed.
+        """
+        if self.is_leaf():
+            if len(self.objects) == 0:
+                bounds_min = np.full(3, np.inf)
+                bounds_max = np.full(3, -np.inf)
+            else:
+                bounds_min = np.min([object.bounds_min for object in self.objects], axis=0)
+                bounds_max = np.max([object.bounds_max for object in self.objects], axis=0)
+        else:
+            bounds_min = np.minimum(self.left.bounds_min, self.right.bounds_min)
+            bounds_max = np.maximum(self.left.bounds_max, self.right.bounds_max)
+
+        changed = not (np.array_equal(bounds_min, self.bounds_min) and np.array_equal(bounds_max, self.bounds_max))
+        self.bounds_min = bounds_min
+        self.bounds_max = bounds_max
+        return changed
+
+    def refit(self):
+        """
+        Updates this node's box and its parents' boxes, stopping as soon as a box doesn't change
+        """
+        node = self
+        while node is not None and node.update_bounds():
+            node = node.parent
+
+class BVH:
+    """
+    Bounding volume hierarchy over objects' world space bounding boxes (Object.bounds_min / bounds_max).
+    Lets frustum culling, ray casts and box overlap queries skip whole groups of objects at once.
+    Objects that move refit their leaf and its parents, the tree isn't rebuilt.
+    """
+    def __init__(self, objects: list[shapes.Object] = [], leaf_size: int = 4) -> None:
+        self.leaf_size = leaf_size
+        self.build(objects)
+
+    def build(self, objects: list[shapes.Object]):
+        """
+        Builds the tree from scratch, splitting the objects in half along the longest axis of their centers each level
+        """
+        self.root = self.build_node(list(objects), None)
+
+    def build_node(self, objects: list[shapes.Object], parent: BVHNode) -> BVHNode:
+        node = BVHNode(parent)
+
+        if len(objects) <= self.leaf_size:
+            node.objects = objects
+            for object in objects:
+                object.bvh_leaf = node
+            node.update_bounds()
+            return node
+
+        # Split at the median along the longest axis
+        centers = np.array([object.bounding_center for object in objects])
+        axis = np.argmax(centers.max(axis=0) - centers.min(axis=0))
+        order = np.argsort(centers[:, axis], kind="stable")
+        half = len(objects) // 2
+
+        node.left = self.build_node([objects[i] for i in order[:half]], node)
+        node.right = self.build_node([objects[i] for i in order[half:]], node)
+        node.update_bounds()
+        return node
+
+    def insert(self, object: shapes.Object):
+        """
+        Adds an object to the leaf whose box would grow the least, splitting the leaf if it gets too big
+        """
+        node = self.root
+        while not node.is_leaf():
+            left_growth = get_surface_area(np.minimum(node.left.bounds_min, object.bounds_min), np.maximum(node.left.bounds_max, object.bounds_max)) - get_surface_area(node.left.bounds_min, node.left.bounds_max)
+            right_growth = get_surface_area(np.minimum(node.right.bounds_min, object.bounds_min), np.maximum(node.right.bounds_max, object.bounds_max)) - get_surface_area(node.right.bounds_min, node.right.bounds_max)
+            node = node.left if left_growth <= right_growth else node.right
+
+        node.objects.append(object)
+        object.bvh_leaf = node
+
+        if len(node.objects) > self.leaf_size:
+            # Turn the leaf into a small subtree
+            subtree = self.build_node(node.objects, node.parent)
+            if node.parent is None:
+                self.root = subtree
+            else:
+                if node.parent.left is node:
+                    node.parent.left = subtree
+                else:
+                    node.parent.right = subtree
+                # The subtree's boxes are already up to date, start from above it
+                node.parent.refit()
+        else:
+            node.refit()
+
+    def remove(self, object: shapes.Object):
+        """
+        Takes an object out of the tree
+        """
+        leaf: BVHNode = object.bvh_leaf
+        leaf.objects.remove(object)
+        object.bvh_leaf = None
+        leaf.refit()
+
+    def get_objects(self) -> list[shapes.Object]:
+        """
+        Returns every object in the tree
+        """
+        return self.collect_objects(self.root, [])
+
+    def collect_objects(self, node: BVHNode, found: list[shapes.Object]) -> list[shapes.Object]:
+        stack = [node]
+        while len(stack) > 0:
+            node = stack.pop()
+            if node.is_leaf():
+                found.extend(node.objects)
+            else:
+                stack.append(node.left)
+                stack.append(node.right)
+        return found
+
+    def query_frustum(self, my_camera: camera.Camera) -> list[shapes.Object]:
+        """
+        Returns the objects whose boxes are at least partly in the camera's view frustum.
+        Once a node's box is fully inside the frustum everything below it is taken without more tests.
+        """
+        # Frustum planes in world space, so the boxes don't have to be moved into view space
+        world_planes = my_camera.frustum.plane_equations @ my_camera.view_matrix
+        normals = world_planes[:, :3]
+        abs_normals = np.abs(normals)
+        offsets = world_planes[:, 3]
+
+        found: list[shapes.Object] = []
+        stack = [self.root]
+        while len(stack) > 0:
+            node = stack.pop()
+            state = classify_box(node.bounds_min, node.bounds_max, normals, abs_normals, offsets)
+            if state == OUTSIDE:
+                continue
+            if state == INSIDE:
+                self.collect_objects(node, found)
+            elif node.is_leaf():
+                for object in node.objects:
+                    if classify_box(object.bounds_min, object.bounds_max, normals, abs_normals, offsets) != OUTSIDE:
+                        found.append(object)
+            else:
+                stack.append(node.left)
+                stack.append(node.right)
+        return found
+
+    def query_ray(self, origin: tuple, direction: tuple, max_distance: float = float("inf")) -> list[tuple[float, shapes.Object]]:
+        """
+        Returns (distance, object) for every object whose box the ray hits within max_distance, closest first.
+        The distance is along the direction vector, so it is in world units when direction is normalized.
+        """
+        origin = np.asarray(origin[:3], dtype=float)
+        direction = np.asarray(direction[:3], dtype=float)
+        with np.errstate(divide="ignore"):
+            inverse_direction = 1 / direction
+
+        hits: list[tuple[float, shapes.Object]] = []
+        stack = [self.root]
+        while len(stack) > 0:
+            node = stack.pop()
+            if ray_box_distance(origin, inverse_direction, node.bounds_min, node.bounds_max, max_distance) is None:
+                continue
+            if node.is_leaf():
+                for object in node.objects:
+                    distance = ray_box_distance(origin, inverse_direction, object.bounds_min, object.bounds_max, max_distance)
+                    if distance is not None:
+                        hits.append((distance, object))
+            else:
+                stack.append(node.left)
+                stack.append(node.right)
+
+        hits.sort(key=lambda hit: hit[0])
+        return hits
+
+    def query_box(self, bounds_min: tuple, bounds_max: tuple) -> list[shapes.Object]:
+        """
+        Returns every object whose box overlaps the given world space box
+        """
+        bounds_min = np.asarray(bounds_min, dtype=float)
+        bounds_max = np.asarray(bounds_max, dtype=float)
+
+        found: list[shapes.Object] = []
+        stack = [self.root]
+        while len(stack) > 0:
+            node = stack.pop()
+            if not do_boxes_overlap(node.bounds_min, node.bounds_max, bounds_min, bounds_max):
+                continue
+            if node.is_leaf():
+                for object in node.objects:
+                    if do_boxes_overlap(object.bounds_min, object.bounds_max, bounds_min, bounds_max):
+                        found.append(object)
+            else:
+                stack.append(node.left)
+                stack.append(node.right)
+        return found
+
+# Results of classify_box
+OUTSIDE = 0
+INTERSECTING = 1
+INSIDE = 2
+
+def classify_box(bounds_min, bounds_max, normals, abs_normals, offsets) -> int:
+    """
+    Returns whether a box is OUTSIDE, INSIDE or INTERSECTING a set of inward facing planes
+    """
+    if np.any(bounds_min > bounds_max): # Empty
+        return OUTSIDE
+
+    center = (bounds_min + bounds_max) / 2
+    half_size = (bounds_max - bounds_min) / 2
+
+    # Distance from the box's center to each plane, and how far the box reaches towards each plane
+    distances = normals @ center + offsets
+    reaches = abs_normals @ half_size
+
+    if np.any(distances < -reaches):
+        return OUTSIDE
+    if np.all(distances >= reaches):
+        return INSIDE
+    return INTERSECTING
+
+def ray_box_distance(origin, inverse_direction, bounds_min, bounds_max, max_distance: float):
+    """
+    Slab test. Returns the distance along the ray to where it enters the box (0 if it starts inside), or None if it misses
+    """
+    if np.any(bounds_min > bounds_max): # Empty
+        return None
+
+    with np.errstate(invalid="ignore"):
+        t1 = (bounds_min - origin) * inverse_direction
+        t2 = (bounds_max - origin) * inverse_direction
+    # nan happens when the ray is parallel to a slab and starts on its edge, treat that as inside the slab
+    t_near = np.nanmax(np.minimum(t1, t2))
+    t_far = np.nanmin(np.maximum(t1, t2))
+
+    if t_far < max(t_near, 0) or t_near > max_distance:
+        return None
+    return max(float(t_near), 0)
+
+def do_boxes_overlap(min_1, max_1, min_2, max_2) -> bool:
+    return bool(np.all(min_1 <= max_2) and np.all(max_1 >= min_2))
+
+def get_surface_area(bounds_min, bounds_max) -> float:
+    size = bounds_max - bounds_min
+    return 2 * (size[0] * size[1] + size[1] * size[2] + size[2] * size[0])
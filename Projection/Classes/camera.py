@@ -1,12 +1,18 @@
 from typing import Any
 from math import tan
-from Classes import colliders
+from copy import copy
+import numpy as np
+from Classes import colliders, frustum
+from Functions import Angles
 
 class Camera:
-    def __init__(self, world_pos: tuple, focal_length: float, fov: float, box_height, box_width, small_move) -> None:
+    def __init__(self, world_pos: tuple, focal_length: float, fov: float, box_height, box_width, small_move, far_clipping_distance: float = 1000) -> None:
         self.focal_length = focal_length
         self.fov = fov
 
+        # Nothing farther away than this is drawn
+        self.far_clipping_distance = far_clipping_distance
+
         # Height (and witdh) of near clipping plane
         self.near_clipping_height = tan(fov/2) * focal_length * 2
 
@@ -44,14 +50,41 @@ class Camera:
             [10, -self.near_clipping_height/2, self.focal_length]
         ]
 
+        self.far_clipping_plane = [
+            [0, 0, self.far_clipping_distance],
+            [0, 10, self.far_clipping_distance],
+            [10, 0, self.far_clipping_distance]
+        ]
+
         self.planes = [self.near_clipping_plane,
                        self.left_clipping_plane,
                        self.right_clipping_plane,
                        self.top_clipping_plane,
-                       self.bottom_clipping_plane]
+                       self.bottom_clipping_plane,
+                       self.far_clipping_plane]
+
+        # Plane equations of the planes above, for fast point tests
+        self.frustum = frustum.Frustum(self.planes)
+
+        # Takes view space points to clip space, where the frustum is -w <= x, y, z <= w and w is the view space depth
+        # z goes from -w on the near plane to w on the far plane
+        near = self.focal_length
+        far = self.far_clipping_distance
+        scale = 1 / tan(fov/2)
+        self.projection_matrix = np.array([
+            [scale, 0, 0, 0],
+            [0, scale, 0, 0],
+            [0, 0, (far + near) / (far - near), -2 * far * near / (far - near)],
+            [0, 0, 1, 0]
+        ])
+
+        self._pitch = 0
+        self._yaw = 0
+
+        # The view matrix is only rebuilt when the camera has moved or turned since it was last used
+        self._view_matrix = None
+        self.view_matrix_dirty = True
 
-        self.pitch = 0
-        self.yaw = 0
         self.translation_matrix: list[list] = [
             [1, 0, 0, world_pos[0]],
             [0, 1, 0, world_pos[1]],
@@ -68,9 +101,65 @@ class Camera:
         self.translation_matrix[0][3] += move_by[0]
         self.translation_matrix[1][3] += move_by[1]
         self.translation_matrix[2][3] += move_by[2]
+        if move_by[0] != 0 or move_by[1] != 0 or move_by[2] != 0:
+            self.view_matrix_dirty = True
         
-        world_pos = self.get_world_pos()
-        self.collider = colliders.BoxCollider((world_pos[0], world_pos[1] - self.box_height / 2, world_pos[2]), (self.box_width, self.box_height, self.box_width))
+        self.collider.move(move_by)
     
+    def snapshot(self) -> "Camera":
+        """
+        Returns a copy of the camera's current pose that later moves / turns don't change, for rendering on another thread.
+        The frustum and other settings are shared with the original.
+        """
+        snapshot = copy(self)
+        snapshot.translation_matrix = [row.copy() for row in self.translation_matrix]
+        return snapshot
+
+    def interpolated(self, previous_pos: tuple, alpha: float) -> "Camera":
+        """
+        Returns a snapshot of the camera moved to alpha of the way from previous_pos to where it is now (0 is previous_pos, 1 is now), for drawing between simulation steps.
+        The camera itself and its collider don't move.
+        """
+        snapshot = self.snapshot()
+        world_pos = self.get_world_pos()
+        for i in range(3):
+            snapshot.translation_matrix[i][3] = previous_pos[i] + (world_pos[i] - previous_pos[i]) * alpha
+        snapshot.view_matrix_dirty = True
+        return snapshot
+
     def get_world_pos(self) -> tuple:
-        return (self.translation_matrix[0][3], self.translation_matrix[1][3], self.translation_matrix[2][3])
\ No newline at end of file
+        return (self.translation_matrix[0][3], self.translation_matrix[1][3], self.translation_matrix[2][3])
+
+    @property
+    def yaw(self) -> float:
+        return self._yaw
+
+    @yaw.setter
+    def yaw(self, yaw: float):
+        if yaw != self._yaw:
+            self._yaw = yaw
+            self.view_matrix_dirty = True
+
+    @property
+    def pitch(self) -> float:
+        return self._pitch
+
+    @pitch.setter
+    def pitch(self, pitch: float):
+        if pitch != self._pitch:
+            self._pitch = pitch
+            self.view_matrix_dirty = True
+
+    @property
+    def view_matrix(self) -> np.ndarray:
+        """
+        4x4 matrix that takes a world space point into view space: undoes the camera's translation, then rotates by yaw and then pitch.
+        The camera is a rigid transform, so the inverse is just the transposed rotation with a rotated, negated translation, no general inverse needed.
+        """
+        if self.view_matrix_dirty:
+            rotation = Angles.get_rotation_matrix(self._yaw, self._pitch)
+            view_matrix = rotation.copy()
+            view_matrix[:3, 3] = -(rotation[:3, :3] @ self.get_world_pos())
+            self._view_matrix = view_matrix
+            self.view_matrix_dirty = False
+        return self._view_matrix
@@ -0,0 +1,165 @@
+import numpy as np
+from math import ceil
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from Classes import camera, voxels, colliders, collision
+
+class ChunkManager:
+    """
+    Splits a block world into chunk_size x chunk_size x chunk_size chunks and only keeps the ones near the camera loaded.
+    get_cells(origin, size) gives the cells of the box of (size + 2)^3 cells starting 1 cell before origin, so each chunk knows its neighbors' edge cells and can hide faces against them.
+    Chunk meshes are built on a background thread. update() never waits for them, chunks just show up once they're ready.
+    Unloaded chunks are kept in a cache for a while so walking back and forth doesn't rebuild them.
+    With level_of_detail on, each chunk also gets coarser meshes (voxels.VoxelGrid.generate_lods) built on the background thread, for the renderer to use when it's far away.
+    With a collision_world, the colliders of each chunk's surface blocks are built on the background thread too, and are in the world while the chunk is loaded.
+    """
+    def __init__(self, get_cells, palette: list[tuple], chunk_size: int = 16, load_distance: float = 48, unload_distance: float = 64, min_chunk_y: int = -1, max_chunk_y: int = 1, cache_size: int = 256, workers: int = 1, level_of_detail: bool = True, collision_world: collision.CollisionWorld = None) -> None:
+        self.get_cells = get_cells
+        self.palette = palette
+        self.chunk_size = chunk_size
+        self.level_of_detail = level_of_detail
+        self.collision_world = collision_world
+
+        # Chunks load inside load_distance and unload outside unload_distance, the gap keeps chunks on the edge from flickering in and out
+        self.load_distance = load_distance
+        self.unload_distance = max(unload_distance, load_distance)
+
+        # Vertical range of chunks that can exist
+        self.min_chunk_y = min_chunk_y
+        self.max_chunk_y = max_chunk_y
+
+        self.loaded: dict[tuple, voxels.VoxelGrid] = {}
+        self.building: dict[tuple, Future] = {}
+        self.cache: OrderedDict[tuple, voxels.VoxelGrid] = OrderedDict()
+        self.cache_size = cache_size
+
+        # Colliders of every loaded and cached chunk, only with a collision world
+        self.chunk_colliders: dict[tuple, list[colliders.BoxCollider]] = {}
+
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    def get_chunk_center(self, chunk: tuple) -> np.ndarray:
+        # Cell i is centered on i, so a chunk's cells span from -0.5 before its first cell
+        return (np.asarray(chunk) + 0.5) * self.chunk_size - 0.5
+
+    def get_chunks_in_range(self, world_pos: tuple, distance: float) -> list[tuple]:
+        """
+        Returns the chunk coordinates whose centers are within distance of a world position
+        """
+        position = np.asarray(world_pos[:3], dtype=float)
+        center_chunk = np.floor((position + 0.5) / self.chunk_size).astype(int)
+        reach = ceil(distance / self.chunk_size)
+
+        chunks = []
+        for cx in range(center_chunk[0] - reach, center_chunk[0] + reach + 1):
+            for cy in range(max(center_chunk[1] - reach, self.min_chunk_y), min(center_chunk[1] + reach, self.max_chunk_y) + 1):
+                for cz in range(center_chunk[2] - reach, center_chunk[2] + reach + 1):
+                    if np.linalg.norm(self.get_chunk_center((cx, cy, cz)) - position) <= distance:
+                        chunks.append((cx, cy, cz))
+        return chunks
+
+    def build_chunk(self, chunk: tuple) -> tuple[voxels.VoxelGrid, list[colliders.BoxCollider]]:
+        """
+        Makes a chunk's voxel grid, and its surface colliders if there's a collision world. Runs on the background thread.
+        """
+        origin = tuple(c * self.chunk_size for c in chunk)
+        neighbors = np.asarray(self.get_cells(origin, self.chunk_size))
+        cells = neighbors[1:-1, 1:-1, 1:-1]
+        chunk_grid = voxels.VoxelGrid(cells, self.palette, world_pos=origin, neighbors=neighbors)
+        if self.level_of_detail:
+            chunk_grid.generate_lods()
+        chunk_colliders = chunk_grid.get_colliders(surface_only=True) if self.collision_world is not None else []
+        return chunk_grid, chunk_colliders
+
+    def load_chunk(self, chunk: tuple, chunk_grid: voxels.VoxelGrid):
+        self.loaded[chunk] = chunk_grid
+        if self.collision_world is not None:
+            self.collision_world.add_all(self.chunk_colliders[chunk])
+
+    def unload_chunk(self, chunk: tuple):
+        """
+        Moves a loaded chunk to the cache
+        """
+        self.cache[chunk] = self.loaded.pop(chunk)
+        if self.collision_world is not None:
+            for collider in self.chunk_colliders[chunk]:
+                self.collision_world.remove(collider)
+
+    def update(self, my_camera: camera.Camera) -> list[voxels.VoxelGrid]:
+        """
+        Loads and unloads chunks around the camera and returns the loaded chunks that have something in them.
+        Call once a frame.
+        """
+        world_pos = my_camera.get_world_pos()
+
+        # Pick up chunks that finished building
+        for chunk, future in list(self.building.items()):
+            if future.done():
+                del self.building[chunk]
+                chunk_grid, self.chunk_colliders[chunk] = future.result()
+                self.load_chunk(chunk, chunk_grid)
+
+        # Load chunks that came into range, from the cache if possible
+        for chunk in self.get_chunks_in_range(world_pos, self.load_distance):
+            if chunk in self.loaded or chunk in self.building:
+                continue
+            if chunk in self.cache:
+                self.load_chunk(chunk, self.cache.pop(chunk))
+            else:
+                self.building[chunk] = self.executor.submit(self.build_chunk, chunk)
+
+        # Unload chunks that went out of range
+        position = np.asarray(world_pos, dtype=float)
+        for chunk in list(self.loaded):
+            if np.linalg.norm(self.get_chunk_center(chunk) - position) > self.unload_distance:
+                self.unload_chunk(chunk)
+        for chunk in list(self.building):
+            if np.linalg.norm(self.get_chunk_center(chunk) - position) > self.unload_distance and self.building[chunk].cancel():
+                del self.building[chunk]
+
+        # Forget the least recently unloaded chunks
+        while len(self.cache) > self.cache_size:
+            chunk, chunk_grid = self.cache.popitem(last=False)
+            self.chunk_colliders.pop(chunk, None)
+
+        return self.get_objects()
+
+    def get_objects(self) -> list[voxels.VoxelGrid]:
+        """
+        Returns the loaded chunks that have at least 1 triangle
+        """
+        return [chunk for chunk in self.loaded.values() if len(chunk.lod_meshes[0]) > 0]
+
+    def wait(self):
+        """
+        Blocks until every chunk that is being built is done. Useful before the first frame or in benchmarks.
+        """
+        for future in list(self.building.values()):
+            future.result()
+
+    def close(self):
+        """
+        Stops the background thread
+        """
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+def hills(origin: tuple, size: int) -> np.ndarray:
+    """
+    Example world for ChunkManager: rolling hills of grass (1) on top of dirt (2), with the ground around y = 0.
+    Returns the (size + 2)^3 cells starting 1 cell before origin.
+    """
+    x = np.arange(origin[0] - 1, origin[0] + size + 1)[:, np.newaxis, np.newaxis]
+    y = np.arange(origin[1] - 1, origin[1] + size + 1)[np.newaxis, :, np.newaxis]
+    z = np.arange(origin[2] - 1, origin[2] + size + 1)[np.newaxis, np.newaxis, :]
+
+    height = hills_height(x, z)
+    cells = np.zeros((size + 2, size + 2, size + 2), dtype=np.int32)
+    cells[np.broadcast_to(y < height, cells.shape)] = 2
+    cells[np.broadcast_to(y == height, cells.shape)] = 1
+    return cells
+
+def hills_height(x, z):
+    """
+    The y of the top (grass) cell of hills in column x, z, works on arrays too
+    """
+    return np.floor(3 * np.sin(x * 0.15) + 3 * np.cos(z * 0.1) + 2 * np.sin((x + z) * 0.05))
@@ -1,13 +1,31 @@
 class BoxCollider:
     def __init__(self, world_pos: tuple, scale: tuple = (1, 1, 1)) -> None:
-        x_width = scale[0]
+        self.scale = scale
+        self.set_position(world_pos)
+
+    def set_position(self, world_pos: tuple):
+        """
+        Moves the box so it's centered on world_pos, changing this collider instead of making a new one
+        """
+        x_width = self.scale[0]
         self.min_x = world_pos[0] - x_width / 2
         self.max_x = world_pos[0] + x_width / 2
-        
-        y_width = scale[1]
+
+        y_width = self.scale[1]
         self.min_y = world_pos[1] - y_width / 2
         self.max_y = world_pos[1] + y_width / 2
-        
-        z_width = scale[2]
+
+        z_width = self.scale[2]
         self.min_z = world_pos[2] - z_width / 2
-        self.max_z = world_pos[2] + z_width / 2
\ No newline at end of file
+        self.max_z = world_pos[2] + z_width / 2
+
+    def move(self, move_by: tuple):
+        self.min_x += move_by[0]
+        self.max_x += move_by[0]
+        self.min_y += move_by[1]
+        self.max_y += move_by[1]
+        self.min_z += move_by[2]
+        self.max_z += move_by[2]
+
+    def get_bounds(self) -> tuple[tuple, tuple]:
+        return (self.min_x, self.min_y, self.min_z), (self.max_x, self.max_y, self.max_z)
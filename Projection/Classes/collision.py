@@ -0,0 +1,127 @@
+from math import floor
+from Classes import colliders
+
+# How far boxes can overlap (floating point error) and still count as just touching
+EPSILON = 1e-7
+
+class CollisionWorld:
+    """
+    Static box colliders in a spatial hash: a dict from grid cell to the colliders touching it.
+    Finding what's near a box only looks at the cells the box covers, so the cost depends on how many colliders are nearby, not how many there are in total.
+    Cell edges are at cell_size * i + offset, the default puts them halfway between whole numbers so blocks centered on whole numbers (Cube, VoxelGrid cells) each fit in one cell.
+    """
+    def __init__(self, cell_size: float = 1, offset: float = -0.5) -> None:
+        self.cell_size = cell_size
+        self.offset = offset
+        self.cells: dict[tuple[int, int, int], list[colliders.BoxCollider]] = {}
+
+    def get_cells(self, bounds_min: tuple, bounds_max: tuple, shrink: float = 0) -> list[tuple[int, int, int]]:
+        """
+        Returns the grid cells a box touches, after shrinking it by shrink on every side
+        """
+        min_x, min_y, min_z = (floor((value + shrink - self.offset) / self.cell_size) for value in bounds_min)
+        max_x, max_y, max_z = (floor((value - shrink - self.offset) / self.cell_size) for value in bounds_max)
+        return [(x, y, z) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1) for z in range(min_z, max_z + 1)]
+
+    def add(self, collider: colliders.BoxCollider):
+        # Shrunk a little so a box that only touches a cell edge isn't stored in the next cell too
+        for cell in self.get_cells(*collider.get_bounds(), EPSILON):
+            self.cells.setdefault(cell, []).append(collider)
+
+    def add_all(self, new_colliders: list[colliders.BoxCollider]):
+        for collider in new_colliders:
+            self.add(collider)
+
+    def remove(self, collider: colliders.BoxCollider):
+        """
+        Takes a collider out, it has to be where it was when it was added
+        """
+        for cell in self.get_cells(*collider.get_bounds(), EPSILON):
+            in_cell = self.cells.get(cell)
+            if in_cell is not None and collider in in_cell:
+                in_cell.remove(collider)
+                if len(in_cell) == 0:
+                    del self.cells[cell]
+
+    def query(self, bounds_min: tuple, bounds_max: tuple) -> list[colliders.BoxCollider]:
+        """
+        Returns the colliders in the cells a box touches (each once). They're near the box but don't have to overlap it.
+        """
+        found = {}
+        for cell in self.get_cells(bounds_min, bounds_max):
+            for collider in self.cells.get(cell, ()):
+                found[id(collider)] = collider
+        return list(found.values())
+
+    def sweep(self, box: colliders.BoxCollider, move_by: tuple) -> tuple[list[float], list[bool]]:
+        """
+        Works out how far a box can move before hitting a collider, without moving it.
+        Axes are swept one after another (y, then x, then z) in a single pass, each against the box's position after the axes before it.
+        Sliding along walls and landing on floors both fall out of this, and nothing is skipped however big the move is.
+        A box that starts inside colliders is pushed out of them first (see push_out), and the push is part of the returned move.
+        Returns the allowed move and whether each axis was stopped by something.
+        """
+        box_min, box_max, moved, hit = self.push_out(box)
+
+        # Everything the box could touch on the way
+        candidates = self.query(
+            tuple(min(box_min[i], box_min[i] + move_by[i]) for i in range(3)),
+            tuple(max(box_max[i], box_max[i] + move_by[i]) for i in range(3))
+        )
+
+        for axis in (1, 0, 2):
+            distance = move_by[axis]
+            if distance == 0:
+                continue
+            other_1 = (axis + 1) % 3
+            other_2 = (axis + 2) % 3
+
+            for collider in candidates:
+                collider_min, collider_max = collider.get_bounds()
+                # Only colliders in the box's way along this axis can stop it
+                if not (box_min[other_1] < collider_max[other_1] - EPSILON and box_max[other_1] > collider_min[other_1] + EPSILON and box_min[other_2] < collider_max[other_2] - EPSILON and box_max[other_2] > collider_min[other_2] + EPSILON):
+                    continue
+
+                if distance > 0 and box_max[axis] <= collider_min[axis] + EPSILON:
+                    gap = collider_min[axis] - box_max[axis]
+                    if gap < distance:
+                        distance = max(gap, 0)
+                        hit[axis] = True
+                elif distance < 0 and box_min[axis] >= collider_max[axis] - EPSILON:
+                    gap = collider_max[axis] - box_min[axis]
+                    if gap > distance:
+                        distance = min(gap, 0)
+                        hit[axis] = True
+
+            moved[axis] += distance
+            box_min[axis] += distance
+            box_max[axis] += distance
+
+        return moved, hit
+
+    def push_out(self, box: colliders.BoxCollider) -> tuple[list[float], list[float], list[float], list[bool]]:
+        """
+        Works out the shortest way out of every collider a box overlaps, one collider at a time along the axis it sticks into it least.
+        Without this a box stuck in the ground can barely move, the blocks next to the one it's in stop it along every axis.
+        Returns the box's bounds after the push, the push and which axes were pushed along.
+        """
+        box_min, box_max = (list(bounds) for bounds in box.get_bounds())
+        pushed = [0.0, 0.0, 0.0]
+        hit = [False, False, False]
+        for collider in self.query(box_min, box_max):
+            collider_min, collider_max = collider.get_bounds()
+            if not all(box_min[i] < collider_max[i] - EPSILON and box_max[i] > collider_min[i] + EPSILON for i in range(3)):
+                continue
+
+            # Every way out, as (distance, axis, move)
+            exits = []
+            for i in range(3):
+                exits.append((collider_max[i] - box_min[i], i, collider_max[i] - box_min[i]))
+                exits.append((box_max[i] - collider_min[i], i, collider_min[i] - box_max[i]))
+            distance, axis, push = min(exits)
+
+            pushed[axis] += push
+            box_min[axis] += push
+            box_max[axis] += push
+            hit[axis] = True
+        return box_min, box_max, pushed, hit
@@ -0,0 +1,54 @@
+import numpy as np
+from Functions import SimpleLinAlg
+
+# How far outside a plane a point can be and still count as on it (floating point error)
+EPSILON = 1e-9
+
+class Frustum:
+    """
+    A view frustum stored as plane equations, built once from planes given as 3 points each (like Camera.planes).
+    Each plane is a normalized normal n and an offset d, a point p is in front of (inside) the plane when n.p + d >= 0.
+    Normals point inward.
+    """
+    def __init__(self, planes: list[list[list[float]]]) -> None:
+        self.plane_equations = np.empty((len(planes), 4))
+        for i, plane in enumerate(planes):
+            normal = SimpleLinAlg.get_plane_normal([list(point) for point in plane])
+            self.plane_equations[i, :3] = normal
+            self.plane_equations[i, 3] = -SimpleLinAlg.dotProd(normal, plane[0])
+
+        self.normals = self.plane_equations[:, :3]
+        self.offsets = self.plane_equations[:, 3]
+
+        # Outcode with every plane's bit set
+        self.all_planes = (1 << len(planes)) - 1
+
+    def plane_distances(self, points) -> np.ndarray:
+        """
+        Given n 3/4x1 points, returns an (n, planes) array of each point's signed distance to each plane.
+        Positive means inside.
+        """
+        points = np.asarray(points, dtype=float)
+        return points[..., :3] @ self.normals.T + self.offsets
+
+    def classify(self, points) -> np.ndarray:
+        """
+        Given n 3/4x1 points, returns an outcode for each one.
+        Bit i of a point's outcode is set when the point is outside plane i, so an outcode of 0 means the point is in the frustum.
+        """
+        outside = self.plane_distances(points) < -EPSILON
+        return outside @ (1 << np.arange(len(self.plane_equations)))
+
+    def is_point_inside(self, point) -> bool:
+        """
+        Returns whether a single 3/4x1 point is inside (or on the edge of) the frustum
+        """
+        return bool(np.all(self.plane_distances(point) >= -EPSILON))
+
+    def are_spheres_visible(self, centers, radii) -> np.ndarray:
+        """
+        Given n 3x1 sphere centers and their radii, returns whether each sphere is at least partly inside the frustum.
+        A sphere is only rejected when it is fully outside one plane, so spheres near a frustum corner can still pass.
+        """
+        radii = np.asarray(radii, dtype=float)
+        return np.all(self.plane_distances(centers) >= -radii[:, np.newaxis] - EPSILON, axis=1)
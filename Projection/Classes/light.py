@@ -0,0 +1,40 @@
+import numpy as np
+
+class DirectionalLight:
+    """
+    Light coming from the same direction everywhere (like the sun), plus an ambient amount that lights every face.
+    version goes up whenever the light changes, so shaded colors cached with an older version are out of date.
+    """
+    def __init__(self, direction: tuple = (0, -0.5, 1), ambient: float = 0.3) -> None:
+        self.version = 0
+        self.direction = direction
+        self.ambient = ambient
+
+    @property
+    def direction(self) -> np.ndarray:
+        return self._direction
+
+    @direction.setter
+    def direction(self, direction: tuple):
+        direction = np.asarray(direction[:3], dtype=float)
+        self._direction = direction / np.linalg.norm(direction)
+        self.version += 1
+
+    @property
+    def ambient(self) -> float:
+        return self._ambient
+
+    @ambient.setter
+    def ambient(self, ambient: float):
+        self._ambient = ambient
+        self.version += 1
+
+    def shade(self, normals: np.ndarray, colors: np.ndarray) -> np.ndarray:
+        """
+        Given (t, 3) world space face normals and their (t, 3) colors, returns the lit colors.
+        Faces pointing straight at the light get their full color, faces pointing away get the ambient amount of it.
+        """
+        # How much each face points towards the light, remapped from -1 to 1 into 0 to 1
+        alignment = (1 - normals @ self._direction) / 2
+        brightness = np.minimum(alignment + self._ambient, 1)
+        return (colors * brightness[:, np.newaxis]).astype(np.uint8)
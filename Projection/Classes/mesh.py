@@ -0,0 +1,86 @@
+import numpy as np
+
+class Mesh:
+    """
+    Triangles stored as one shared vertex array plus an index buffer, so a corner used by several triangles is only stored (and transformed) once.
+    vertices: (v, 4) model space points
+    indices: (t, 3) the vertex indices of each triangle's 3 corners
+    colors: (t, 3) each triangle's color
+    normals: (t, 3) each triangle's model space face normal, pointing the same way as SimpleLinAlg.get_plane_normal, worked out from the triangles if not given
+    """
+    def __init__(self, vertices, indices, colors, normals=None) -> None:
+        self.vertices = np.asarray(vertices, dtype=float).reshape(-1, 4)
+        self.indices = np.asarray(indices, dtype=np.int32).reshape(-1, 3)
+
+        # One color for every triangle, or a color per triangle
+        colors = np.asarray(colors, dtype=np.uint8)
+        if colors.ndim == 1:
+            colors = np.tile(colors, (len(self.indices), 1))
+        self.colors = colors.reshape(-1, 3)
+
+        if normals is None:
+            self.normals = get_face_normals(self.vertices, self.indices)
+        else:
+            self.normals = np.asarray(normals, dtype=float).reshape(-1, 3)
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def get_triangle_points(self) -> np.ndarray:
+        """
+        Returns every triangle's model space corners as a (t, 3, 4) array
+        """
+        return self.vertices[self.indices]
+
+def get_face_normals(vertices: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    """
+    Returns the normalized normal of every triangle, (b - a) x (c - a) for corners a, b, c
+    """
+    if len(indices) == 0:
+        return np.empty((0, 3))
+
+    corners = vertices[indices][:, :, :3]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    lengths[lengths == 0] = 1 # Degenerate triangles keep a zero normal
+    return normals / lengths
+
+def combine_meshes(meshes: list[Mesh]) -> Mesh:
+    """
+    Joins several meshes into one, offsetting each mesh's indices past the vertices before it
+    """
+    if len(meshes) == 0:
+        return Mesh(np.empty((0, 4)), np.empty((0, 3)), np.empty((0, 3)))
+
+    offsets = np.cumsum([0] + [len(mesh.vertices) for mesh in meshes[:-1]])
+    vertices = np.concatenate([mesh.vertices for mesh in meshes])
+    indices = np.concatenate([mesh.indices + offset for mesh, offset in zip(meshes, offsets)])
+    colors = np.concatenate([mesh.colors for mesh in meshes])
+    return Mesh(vertices, indices, colors)
+
+def simplify_mesh(object_mesh: Mesh, cell_size: float) -> Mesh:
+    """
+    Returns a lower detail copy of a mesh made by vertex clustering: vertices in the same cell_size grid cell are merged into their average, and triangles that collapse are dropped.
+    Bigger cells give fewer triangles. Triangles keep their colors.
+    """
+    if len(object_mesh) == 0:
+        return object_mesh
+
+    positions = object_mesh.vertices[:, :3]
+    cells = np.floor(positions / cell_size).astype(np.int64)
+    _, clusters, counts = np.unique(cells, axis=0, return_inverse=True, return_counts=True)
+    clusters = clusters.reshape(-1)
+
+    merged = np.zeros((len(counts), 3))
+    np.add.at(merged, clusters, positions)
+    merged /= counts[:, np.newaxis]
+
+    # Triangles with 2 corners in the same cluster have no area left
+    indices = clusters[object_mesh.indices]
+    keep = (indices[:, 0] != indices[:, 1]) & (indices[:, 1] != indices[:, 2]) & (indices[:, 2] != indices[:, 0])
+    indices = indices[keep]
+
+    # Only keep the vertices that are still used
+    used, indices = np.unique(indices, return_inverse=True)
+    vertices = np.hstack([merged[used], np.ones((len(used), 1))])
+    return Mesh(vertices, indices.reshape(-1, 3), object_mesh.colors[keep])
@@ -0,0 +1,199 @@
+import numpy as np
+from math import ceil
+from Classes import camera, shapes
+from Functions import Geometry, Projecting
+
+class OcclusionBuffer:
+    """
+    Hides objects that are completely behind nearer geometry, before any of their triangles are transformed.
+    Each frame the biggest objects on screen (the occluders) are rasterized into a small depth buffer, scale times smaller than the screen, which is then reduced into a mip pyramid.
+    An object's bounding box is hidden if it's farther away than everything in the few pyramid texels its screen rectangle covers.
+
+    Like the renderer's depth buffer it stores 1/z (0 is nothing, bigger is closer) indexed [x, y].
+    Depths are kept conservative: a low res pixel gets the farthest depth of the occluder anywhere inside the pixel, and each pyramid texel keeps the farthest depth of the 4 below it.
+    Coverage isn't, occluders fill the pixels whose centers they cover, so something smaller than a low res pixel peeking past an occluder's edge can be missed.
+    """
+    def __init__(self, width: int, height: int, scale: int = 8, min_occluder_size: float = 16, max_occluder_triangles: int = 4096, min_objects: int = 16) -> None:
+        self.width = width
+        self.height = height
+        self.scale = scale
+        self.size = (ceil(width / scale), ceil(height / scale))
+
+        # Objects at least min_occluder_size pixels across on screen can be occluders, biggest first until there are max_occluder_triangles triangles
+        self.min_occluder_size = min_occluder_size
+        self.max_occluder_triangles = max_occluder_triangles
+
+        # With fewer objects than this on screen, drawing the occluders costs more than culling could save
+        self.min_objects = min_objects
+
+        # levels[0] is the low res depth buffer, each level after it is half the size
+        self.levels: list[np.ndarray] = [np.zeros(self.size)]
+
+    def get_occluders(self, objects: list[shapes.Object], screen_sizes: np.ndarray) -> list[shapes.Object]:
+        """
+        Picks the objects to draw into the buffer, biggest on screen first.
+        Only objects drawn at full detail are used, simplified meshes can stick out past the real surface.
+        """
+        occluders = []
+        triangles = 0
+        for index in np.argsort(-screen_sizes, kind="stable"):
+            object = objects[index]
+            if screen_sizes[index] < self.min_occluder_size:
+                break
+            if object.lod_level != 0:
+                continue
+            if triangles + len(object.mesh) > self.max_occluder_triangles:
+                continue
+            occluders.append(object)
+            triangles += len(object.mesh)
+        return occluders
+
+    def draw_occluders(self, occluders: list[shapes.Object], my_camera: camera.Camera):
+        """
+        Clears the buffer and rasterizes the occluders' triangles into it, all at once
+        """
+        depth_buffer = self.levels[0]
+        depth_buffer.fill(0)
+        if len(occluders) == 0:
+            return
+
+        view_matrix = my_camera.view_matrix
+        points = np.concatenate([object.get_world_vertices()[object.mesh.indices] for object in occluders]) @ view_matrix.T
+
+        # Only triangles facing the camera and entirely in front of the near plane, anything else could only make the buffer less accurate
+        normals = Geometry.get_triangle_normals(points)
+        centroids = Geometry.get_triangle_centroids(points)
+        keep = (np.einsum("ij,ij->i", centroids, normals) < 0) & np.all(points[:, :, 2] > my_camera.focal_length, axis=1)
+        points = points[keep]
+        if len(points) == 0:
+            return
+
+        # Corners in low res pixels, pixel (x, y) covers x to x + 1 and y to y + 1
+        corners = Projecting.project_points(points.reshape(-1, 4), my_camera, self.width, self.height).reshape(-1, 3, 2) / self.scale
+        inverse_depths = 1 / points[:, :, 2]
+
+        # Twice the signed area, dropping triangles with none
+        edge_1 = corners[:, 1] - corners[:, 0]
+        edge_2 = corners[:, 2] - corners[:, 0]
+        areas = edge_1[:, 0] * edge_2[:, 1] - edge_1[:, 1] * edge_2[:, 0]
+        keep = np.abs(areas) > 1e-9
+        corners, inverse_depths, areas = corners[keep], inverse_depths[keep], areas[keep]
+
+        # Every pixel in each triangle's bounding rectangle, as (triangle, x, y)
+        min_x = np.clip(np.floor(corners[:, :, 0].min(axis=1)), 0, self.size[0]).astype(np.int64)
+        max_x = np.clip(np.ceil(corners[:, :, 0].max(axis=1)), 0, self.size[0]).astype(np.int64)
+        min_y = np.clip(np.floor(corners[:, :, 1].min(axis=1)), 0, self.size[1]).astype(np.int64)
+        max_y = np.clip(np.ceil(corners[:, :, 1].max(axis=1)), 0, self.size[1]).astype(np.int64)
+        columns = max_x - min_x
+        pixel_counts = columns * (max_y - min_y)
+        triangles = np.repeat(np.arange(len(corners)), pixel_counts)
+        if len(triangles) == 0:
+            return
+        pixel_index = np.arange(len(triangles)) - np.repeat(np.cumsum(pixel_counts) - pixel_counts, pixel_counts)
+        pixel_x = min_x[triangles] + pixel_index % columns[triangles]
+        pixel_y = min_y[triangles] + pixel_index // columns[triangles]
+
+        # A pixel is covered if its center is inside the triangle, and gets the farthest of the triangle's depths at its corners
+        triangle_corners = corners[triangles]
+        triangle_areas = areas[triangles]
+        triangle_depths = inverse_depths[triangles]
+        weights = get_barycentric_weights(triangle_corners, triangle_areas, pixel_x + 0.5, pixel_y + 0.5)
+        covered = np.all(weights >= 0, axis=1)
+        depth = np.full(len(triangles), np.inf)
+        for offset_x, offset_y in ((0, 0), (1, 0), (0, 1), (1, 1)):
+            weights = get_barycentric_weights(triangle_corners, triangle_areas, pixel_x + offset_x, pixel_y + offset_y)
+            depth = np.minimum(depth, np.einsum("ij,ij->i", weights, triangle_depths))
+
+        np.maximum.at(depth_buffer, (pixel_x[covered], pixel_y[covered]), depth[covered])
+
+    def build_pyramid(self):
+        """
+        Rebuilds the coarser levels from the depth buffer, each texel keeping the farthest of the 4 below it
+        """
+        self.levels = self.levels[:1]
+        level = self.levels[0]
+        while level.shape[0] > 1 or level.shape[1] > 1:
+            # Odd sizes get a row / column of nothing (farthest) added
+            if level.shape[0] % 2 == 1 or level.shape[1] % 2 == 1:
+                level = np.pad(level, ((0, level.shape[0] % 2), (0, level.shape[1] % 2)))
+            level = np.minimum(np.minimum(level[0::2, 0::2], level[1::2, 0::2]), np.minimum(level[0::2, 1::2], level[1::2, 1::2]))
+            self.levels.append(level)
+
+    def are_boxes_visible(self, bounds_min: np.ndarray, bounds_max: np.ndarray, my_camera: camera.Camera) -> np.ndarray:
+        """
+        Given (n, 3) world space bounding boxes, returns whether each one could be visible past the occluders
+        """
+        visible = np.ones(len(bounds_min), dtype=bool)
+        if len(bounds_min) == 0:
+            return visible
+
+        # The 8 corners of every box in view space
+        corner_picks = np.array([[(i >> axis) & 1 for axis in range(3)] for i in range(8)], dtype=bool)
+        corners = np.where(corner_picks[np.newaxis], bounds_max[:, np.newaxis], bounds_min[:, np.newaxis])
+        view_matrix = my_camera.view_matrix
+        corners = corners @ view_matrix[:3, :3].T + view_matrix[:3, 3]
+
+        # Boxes reaching past the near plane can't be projected, they stay visible
+        testable = np.flatnonzero(np.all(corners[:, :, 2] > my_camera.focal_length, axis=1))
+        if len(testable) == 0:
+            return visible
+        corners = corners[testable]
+        nearest = (1 / corners[:, :, 2]).max(axis=1)
+
+        # The low res pixels each box covers on screen
+        screen_corners = Projecting.project_points(corners.reshape(-1, 3), my_camera, self.width, self.height).reshape(-1, 8, 2) / self.scale
+        min_x = np.floor(screen_corners[:, :, 0].min(axis=1))
+        max_x = np.floor(screen_corners[:, :, 0].max(axis=1))
+        min_y = np.floor(screen_corners[:, :, 1].min(axis=1))
+        max_y = np.floor(screen_corners[:, :, 1].max(axis=1))
+        on_screen = (max_x >= 0) & (min_x < self.size[0]) & (max_y >= 0) & (min_y < self.size[1])
+        min_x = np.clip(min_x, 0, self.size[0] - 1).astype(np.int64)
+        max_x = np.clip(max_x, 0, self.size[0] - 1).astype(np.int64)
+        min_y = np.clip(min_y, 0, self.size[1] - 1).astype(np.int64)
+        max_y = np.clip(max_y, 0, self.size[1] - 1).astype(np.int64)
+
+        # The first level where the rectangle fits in 2x2 texels
+        span = np.maximum(max_x - min_x, max_y - min_y) + 1
+        level_numbers = np.minimum(np.ceil(np.log2(span)).astype(np.int64), len(self.levels) - 1)
+
+        farthest = np.zeros(len(testable))
+        for level_number in np.unique(level_numbers):
+            in_level = np.flatnonzero(level_numbers == level_number)
+            level = self.levels[level_number]
+            x_0, x_1 = min_x[in_level] >> level_number, max_x[in_level] >> level_number
+            y_0, y_1 = min_y[in_level] >> level_number, max_y[in_level] >> level_number
+            farthest[in_level] = np.minimum(np.minimum(level[x_0, y_0], level[x_1, y_0]), np.minimum(level[x_0, y_1], level[x_1, y_1]))
+
+        visible[testable] = ~on_screen | (nearest >= farthest)
+        return visible
+
+    def cull_objects(self, objects: list[shapes.Object], my_camera: camera.Camera, screen_sizes: np.ndarray) -> list[shapes.Object]:
+        """
+        Draws the occluders picked from objects and returns the objects that aren't hidden behind them.
+        Returns all the objects without drawing anything when there are fewer than min_objects or none of them are big enough to be occluders.
+        """
+        if len(objects) < self.min_objects:
+            return objects
+        occluders = self.get_occluders(objects, screen_sizes)
+        if len(occluders) == 0:
+            return objects
+        self.draw_occluders(occluders, my_camera)
+        self.build_pyramid()
+
+        bounds_min = np.array([object.bounds_min for object in objects])
+        bounds_max = np.array([object.bounds_max for object in objects])
+        is_visible = self.are_boxes_visible(bounds_min, bounds_max, my_camera)
+        return [object for object, visible in zip(objects, is_visible) if visible]
+
+def get_barycentric_weights(corners: np.ndarray, areas: np.ndarray, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    Given (n, 3, 2) screen triangles, twice their signed areas and a point for each, returns the (n, 3) barycentric weights of the points.
+    The weights are all positive inside the triangle whichever way it's wound.
+    """
+    weights = np.empty((len(corners), 3))
+    for i in range(3):
+        # Edge function of the edge across from corner i
+        a = corners[:, (i + 1) % 3]
+        b = corners[:, (i + 2) % 3]
+        weights[:, i] = ((b[:, 0] - a[:, 0]) * (y - a[:, 1]) - (b[:, 1] - a[:, 1]) * (x - a[:, 0])) / areas
+    return weights
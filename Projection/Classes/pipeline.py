@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import TYPE_CHECKING
+from Classes import camera, shapes, bvh, buffers, profiler
+
+if TYPE_CHECKING: # renderer imports this module
+    from Classes import renderer
+
+class FramePipeline:
+    """
+    Runs a renderer's geometry stage (culling, transforming, clipping, projecting) on a worker thread, one frame ahead of drawing.
+    While the main thread draws and flips frame N, the worker works on frame N + 1, so a frame takes about as long as the slower stage instead of both added up.
+    Frames are double buffered: the 2 frames in flight use different working buffers, so the worker never writes over data the other frame is still using.
+    What's on screen is one frame behind the latest camera pose.
+    The camera is copied when a frame is started, but objects aren't, don't move objects between render_frame() and the next render_frame() / finish() without calling wait() first.
+    """
+    def __init__(self, my_renderer: "renderer.Renderer") -> None:
+        self.renderer = my_renderer
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+        # Working buffers for even and odd frames
+        self.buffer_pools = [my_renderer.buffer_pool, buffers.BufferPool()]
+        self.frame = 0
+
+        # Geometry of the started frame that hasn't been drawn yet
+        self.pending: Future = None
+
+    def start_frame(self, objects: list[shapes.Object] | bvh.BVH, my_camera: camera.Camera):
+        """
+        Starts processing a frame's geometry on the worker thread
+        """
+        buffer_pool = self.buffer_pools[self.frame % 2]
+        self.pending = self.executor.submit(self.process_frame, objects, my_camera.snapshot(), buffer_pool)
+        self.frame += 1
+
+    def process_frame(self, objects: list[shapes.Object] | bvh.BVH, my_camera: camera.Camera, buffer_pool: buffers.BufferPool) -> tuple[tuple, "profiler.Recording"]:
+        """
+        Runs on the worker thread, returns the frame's geometry and what the profiler recorded while working it out.
+        The recording is kept apart from the main thread's frame, which is still the previous one.
+        """
+        with self.renderer.profiler.record() as recording:
+            geometry = self.renderer.process_geometry(objects, my_camera, buffer_pool)
+        return geometry, recording
+
+    def render_frame(self, objects: list[shapes.Object] | bvh.BVH, my_camera: camera.Camera) -> int:
+        """
+        Starts the geometry of a frame from the camera's current pose, then draws the frame started by the previous call.
+        Returns the number of triangles drawn (0 on the first call, when there is nothing to draw yet).
+        """
+        previous = self.pending
+        self.start_frame(objects, my_camera)
+        if previous is None:
+            return 0
+        return self.draw(previous)
+
+    def finish(self) -> int:
+        """
+        Draws the last started frame, leaving nothing in flight
+        """
+        if self.pending is None:
+            return 0
+        pending = self.pending
+        self.pending = None
+        return self.draw(pending)
+
+    def wait(self):
+        """
+        Blocks until the worker is done with the started frame, after which objects can be changed safely
+        """
+        if self.pending is not None:
+            self.pending.result()
+
+    def draw(self, frame: Future) -> int:
+        """
+        Draws a processed frame, its geometry stages are profiled as part of the frame drawing it
+        """
+        (polygons, colors, stats), recording = frame.result()
+        self.renderer.profiler.merge(recording)
+        self.renderer.draw_polygons(polygons, colors)
+        return stats.triangles_drawn
+
+    def close(self):
+        """
+        Stops the worker thread
+        """
+        self.executor.shutdown(wait=True)
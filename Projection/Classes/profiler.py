@@ -0,0 +1,190 @@
+import json
+import threading
+from collections import deque
+from time import perf_counter
+import pygame
+
+class Stage:
+    """
+    Times one stage of a frame, made by Profiler.stage() and used with a with statement
+    """
+    __slots__ = ("events", "name", "start")
+
+    def __init__(self, events: list, name: str) -> None:
+        self.events = events
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        self.events.append((self.name, self.start, perf_counter(), threading.get_ident()))
+
+class NullStage:
+    """
+    What Profiler.stage() gives back when profiling is off, does nothing
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        pass
+
+NULL_STAGE = NullStage()
+
+class Recording:
+    """
+    Stages and counts recorded apart from the current frame, made by Profiler.record() and used with a with statement.
+    While it's open, everything the thread that opened it records goes into it, until Profiler.merge() adds it to the frame it belongs to.
+    """
+    __slots__ = ("profiler", "events", "counts")
+
+    def __init__(self, profiler: "Profiler") -> None:
+        self.profiler = profiler
+        self.events: list[tuple[str, float, float, int]] = []
+        self.counts: dict[str, tuple[int, int]] = {}
+
+    def __enter__(self):
+        self.profiler.local.recording = self
+        return self
+
+    def __exit__(self, *exception):
+        self.profiler.local.recording = None
+
+class Profiler:
+    """
+    Times the stages of each frame and counts how many triangles (or objects) go in and out of them.
+    The last history frames are kept, and can be shown as an overlay or saved as a Chrome trace (chrome://tracing, ui.perfetto.dev).
+    When disabled, stage() returns a shared object that does nothing and count() returns straight away, so leaving the calls in costs close to nothing.
+
+    Usage:
+        my_profiler.begin_frame()
+        with my_profiler.stage("clip"):
+            ...
+        my_profiler.count("clip", triangles_in, triangles_out)
+        my_profiler.end_frame()
+
+    Work done for a frame on another thread (like pipeline.FramePipeline's geometry) is recorded with record() and added to the frame that uses it with merge().
+    """
+    def __init__(self, enabled: bool = False, history: int = 300) -> None:
+        self.enabled = enabled
+
+        # Finished frames, oldest first: (frame start, frame end, events, counts)
+        self.frames: deque[tuple[float, float, list, dict]] = deque(maxlen=history)
+
+        # The frame being recorded: (stage name, start, end, thread id) events and stage name -> (in, out) counts
+        self.frame_start = perf_counter()
+        self.events: list[tuple[str, float, float, int]] = []
+        self.counts: dict[str, tuple[int, int]] = {}
+
+        # Each thread's open Recording, if any
+        self.local = threading.local()
+
+        # Made the first time the overlay is drawn
+        self.font: pygame.font.Font = None
+
+    def stage(self, name: str) -> Stage | NullStage:
+        if not self.enabled:
+            return NULL_STAGE
+        return Stage(self.get_events(), name)
+
+    def count(self, name: str, count_in: int, count_out: int):
+        """
+        Records how many things went into and came out of a stage this frame
+        """
+        if not self.enabled:
+            return
+        recording = getattr(self.local, "recording", None)
+        (self.counts if recording is None else recording.counts)[name] = (count_in, count_out)
+
+    def get_events(self) -> list[tuple[str, float, float, int]]:
+        """
+        Returns the events list this thread's stages go into: its open Recording's, or the current frame's
+        """
+        recording = getattr(self.local, "recording", None)
+        return self.events if recording is None else recording.events
+
+    def record(self) -> Recording:
+        return Recording(self)
+
+    def merge(self, recording: Recording):
+        """
+        Adds a finished Recording's stages and counts to the current frame
+        """
+        if not self.enabled:
+            return
+        self.events.extend(recording.events)
+        self.counts.update(recording.counts)
+
+    def begin_frame(self):
+        self.frame_start = perf_counter()
+        self.events = []
+        self.counts = {}
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        self.frames.append((self.frame_start, perf_counter(), self.events, self.counts))
+
+    def get_stage_times(self, frames: int = 60) -> dict[str, float]:
+        """
+        Returns the average time in seconds each stage took per frame over the last few frames, in the order the stages first ran
+        """
+        recent = list(self.frames)[-frames:]
+        totals: dict[str, float] = {}
+        for frame in recent:
+            for name, start, end, thread in frame[2]:
+                totals[name] = totals.get(name, 0) + end - start
+        return {name: total / max(len(recent), 1) for name, total in totals.items()}
+
+    def get_frame_time(self, frames: int = 60) -> float:
+        """
+        Returns the average whole frame time in seconds over the last few frames
+        """
+        recent = list(self.frames)[-frames:]
+        return sum(end - start for start, end, events, counts in recent) / max(len(recent), 1)
+
+    def draw_overlay(self, surface: pygame.Surface, position: tuple = (5, 5)):
+        """
+        Draws the average frame time, each stage's time and the last frame's counts in the corner of a surface
+        """
+        if not self.enabled:
+            return
+        if self.font is None:
+            pygame.font.init()
+            self.font = pygame.font.Font(None, 18)
+
+        counts = self.frames[-1][3] if len(self.frames) > 0 else {}
+        lines = [f"frame {self.get_frame_time() * 1000:.2f} ms"]
+        for name, seconds in self.get_stage_times().items():
+            line = f"{name} {seconds * 1000:.2f} ms"
+            if name in counts:
+                line += f"  {counts[name][0]} -> {counts[name][1]}"
+            lines.append(line)
+
+        x, y = position
+        for line in lines:
+            text = self.font.render(line, True, (255, 255, 255), (0, 0, 0))
+            surface.blit(text, (x, y))
+            y += text.get_height()
+
+    def export_chrome_trace(self, path: str):
+        """
+        Saves the kept frames as a Chrome trace event JSON file: one slice per stage (on the thread it ran on) and a counter per stage's output
+        """
+        trace_events = []
+        threads: dict[int, int] = {threading.main_thread().ident: 0}
+        for frame_start, frame_end, events, counts in self.frames:
+            trace_events.append({"name": "frame", "ph": "X", "ts": frame_start * 1e6, "dur": (frame_end - frame_start) * 1e6, "pid": 0, "tid": 0})
+            for name, start, end, thread in events:
+                # Small thread numbers read better than thread ids, 0 is the main thread
+                tid = threads.setdefault(thread, len(threads))
+                trace_events.append({"name": name, "ph": "X", "ts": start * 1e6, "dur": (end - start) * 1e6, "pid": 0, "tid": tid})
+            for name, (count_in, count_out) in counts.items():
+                trace_events.append({"name": name, "ph": "C", "ts": frame_start * 1e6, "pid": 0, "args": {"in": count_in, "out": count_out}})
+
+        with open(path, "w") as file:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, file)
@@ -0,0 +1,257 @@
+import pygame
+import numpy as np
+from time import perf_counter
+from Classes import camera, shapes, bvh, buffers, light, tiles, pipeline, profiler, occlusion
+from Functions import Geometry, Projecting, Linalg, Angles, Rasterizing
+
+WHITE: tuple = (255, 255, 255)
+BLACK: tuple = (0, 0, 0)
+
+class Renderer:
+    """
+    Draws a list of objects from a camera's point of view onto a pygame surface.
+    The surface can be the window or an offscreen pygame.Surface, so frames can be rendered without a display.
+    With depth_buffer on, triangles are rasterized into numpy color / depth buffers instead of being sorted and drawn back to front.
+    With workers > 0 the depth buffer is used and rasterized in screen tiles by that many processes (see tiles.TileRenderer), call close() when done.
+    With level_of_detail on, objects that have simpler meshes (shapes.Object.generate_lods) switch between them by how big they are on screen.
+    With occlusion_culling on, objects hidden behind the biggest objects on screen are skipped (see occlusion.OcclusionBuffer), which pays off in dense or enclosed scenes.
+    """
+    def __init__(self, surface: pygame.Surface, width: int, height: int, lighting: bool = True, light_dir: tuple = (0, -0.5, 1, 0), ambient_light: float = 0.3, draw_border: bool = True, depth_buffer: bool = False, workers: int = 0, my_profiler: profiler.Profiler = None, level_of_detail: bool = True, occlusion_culling: bool = False) -> None:
+        self.surface = surface
+        self.width = width
+        self.height = height
+
+        self.lighting = lighting
+        self.light = light.DirectionalLight(light_dir, ambient_light)
+
+        # Draws the edges of the screen area for debugging
+        self.draw_border = draw_border
+
+        # Z-buffer, indexed [x, y] like pygame.surfarray
+        self.depth_buffer = depth_buffer or workers > 0
+        self.tile_renderer = None
+        if workers > 0:
+            # The buffers are shared with the worker processes
+            self.tile_renderer = tiles.TileRenderer(surface.get_size(), workers)
+            self.color_buffer_array = self.tile_renderer.color_buffer
+            self.depth_buffer_array = self.tile_renderer.depth_buffer
+        elif self.depth_buffer:
+            self.color_buffer_array = np.zeros((*surface.get_size(), 3), dtype=np.uint8)
+            self.depth_buffer_array = np.zeros(surface.get_size())
+
+        # Picks each visible object's detail level every frame
+        self.level_of_detail = level_of_detail
+
+        # Low res depth buffer of the nearest big objects, for hiding objects behind them
+        self.occlusion_buffer = occlusion.OcclusionBuffer(width, height) if occlusion_culling else None
+
+        # Times each stage of the frame when enabled
+        self.profiler = my_profiler if my_profiler is not None else profiler.Profiler()
+
+        # Per-frame working arrays, kept between frames
+        self.buffer_pool = buffers.BufferPool()
+
+    def render_frame(self, objects: list[shapes.Object] | bvh.BVH, my_camera: camera.Camera) -> int:
+        """
+        Draws one frame of the objects onto the surface.
+        objects can be a list, or a bvh.BVH so culling can skip groups of objects at once.
+        Returns the number of triangles that were drawn.
+        """
+        polygons, colors, stats = self.process_geometry(objects, my_camera)
+        self.draw_polygons(polygons, colors)
+        return stats.triangles_drawn
+
+    def process_geometry(self, objects: list[shapes.Object] | bvh.BVH, my_camera: camera.Camera, buffer_pool: buffers.BufferPool = None) -> tuple[list[list[tuple]], list[tuple], "FrameStats"]:
+        """
+        Culls, transforms, clips and projects the objects' triangles.
+        Returns the screen space polygons to draw, in draw order, their colors and the frame's FrameStats.
+        Polygon points are (x, y), or (x, y, 1/z) with the depth buffer.
+        Working arrays come from buffer_pool (default: the renderer's own), so frames processed at the same time need different pools.
+        Nothing about the frame is stored on the renderer, so it can run on another thread while an earlier frame is drawn.
+        """
+        if buffer_pool is None:
+            buffer_pool = self.buffer_pool
+
+        # Skip whole objects that are outside the frustum
+        with self.profiler.stage("cull"):
+            if isinstance(objects, bvh.BVH):
+                visible_objects = objects.query_frustum(my_camera)
+            else:
+                visible_objects = Linalg.cull_objects(objects, my_camera)
+        objects_visible = len(visible_objects)
+        if self.profiler.enabled:
+            self.profiler.count("cull", len(objects.get_objects()) if isinstance(objects, bvh.BVH) else len(objects), len(visible_objects))
+        objects = visible_objects
+
+        # Screen sizes pick each object's detail level, and the occluders
+        if self.level_of_detail or self.occlusion_buffer is not None:
+            with self.profiler.stage("lod"):
+                screen_sizes = self.get_screen_sizes(objects, my_camera)
+                if self.level_of_detail:
+                    for object, screen_size in zip(objects, screen_sizes.tolist()):
+                        if len(object.lod_meshes) > 1:
+                            object.select_lod(screen_size)
+
+        # Skip whole objects that are behind others
+        if self.occlusion_buffer is not None:
+            with self.profiler.stage("occlusion"):
+                unoccluded_objects = self.occlusion_buffer.cull_objects(objects, my_camera, screen_sizes)
+            self.profiler.count("occlusion", len(objects), len(unoccluded_objects))
+            objects = unoccluded_objects
+
+        # Faces are lit in world space, with shaded colors cached on each object until it or the light changes
+        my_light = self.light if self.lighting else None
+        if my_light is not None:
+            with self.profiler.stage("lighting"):
+                for object in objects:
+                    object.get_shaded_colors(my_light)
+
+        # Get the triangles facing the camera in view space
+        with self.profiler.stage("transform"):
+            view_space_points, view_space_colors = Projecting.objects_to_view_space(objects, my_camera.view_matrix, buffer_pool, my_light, my_camera.get_world_pos())
+        if self.profiler.enabled:
+            self.profiler.count("transform", sum(len(object.mesh) for object in objects), len(view_space_points))
+
+        # Frustum culling, for every triangle at once
+        with self.profiler.stage("visibility"):
+            visible = np.flatnonzero(Linalg.are_triangles_visible(view_space_points, my_camera))
+        self.profiler.count("visibility", len(view_space_points), len(visible))
+
+        # Sort triangles from farthest to closest to the camera, the depth buffer doesn't need them in order
+        if not self.depth_buffer:
+            with self.profiler.stage("sort"):
+                distances = np.linalg.norm(Geometry.get_triangle_centroids(view_space_points[visible]), axis=1)
+                visible = visible[np.argsort(distances, kind="stable")[::-1]]
+
+        # Move the triangles to clip space and clip the ones crossing the edges of the frustum
+        with self.profiler.stage("clip"):
+            clip_space_points = np.matmul(view_space_points[visible], my_camera.projection_matrix.T)
+            outcodes = Linalg.get_clip_outcodes(clip_space_points.reshape(-1, 4)).reshape(-1, 3)
+            crossing = np.flatnonzero(outcodes.any(axis=1))
+            clipped_polygons = []
+            for points in clip_space_points[crossing].tolist():
+                clipped_polygons.append(Linalg.clip_polygon(points))
+        if self.profiler.enabled:
+            self.profiler.count("clip", len(visible), len(visible) - clipped_polygons.count(None))
+
+        # Perspective divide and viewport mapping for every point at once
+        with self.profiler.stage("project"):
+            point_size = 3 if self.depth_buffer else 2 # Keep 1/z with the points for the depth test
+            # Triangles crossing the near plane can divide by 0 here, they're replaced by their clipped polygons below
+            with np.errstate(divide="ignore", invalid="ignore"):
+                screen_points = Projecting.clip_to_screen(clip_space_points.reshape(-1, 4), self.width, self.height)
+                # Points in the same order as Angles.convex_hull gives, pygame fills polygons slightly differently depending on where they start
+                polygons = Angles.order_triangles(screen_points[:, :point_size].reshape(-1, 3, point_size)).tolist()
+
+            kept_polygons = [polygon for polygon in clipped_polygons if polygon is not None]
+            if len(kept_polygons) > 0:
+                clipped_screen_points = Projecting.clip_to_screen(np.array([point for polygon in kept_polygons for point in polygon]), self.width, self.height)[:, :point_size].tolist()
+            start = 0
+            for index, clipped_polygon in zip(crossing.tolist(), clipped_polygons):
+                if clipped_polygon is None:
+                    polygons[index] = None
+                else:
+                    # clip_polygon keeps the points in order around the polygon, and projecting doesn't change that
+                    polygons[index] = clipped_screen_points[start:start + len(clipped_polygon)]
+                    start += len(clipped_polygon)
+
+            colors = view_space_colors[visible].tolist()
+            polygon_colors = [color for polygon, color in zip(polygons, colors) if polygon is not None]
+            polygons = [polygon for polygon in polygons if polygon is not None]
+        self.profiler.count("project", len(visible), len(polygons))
+
+        return polygons, polygon_colors, FrameStats(objects_visible, len(polygons))
+
+    def get_screen_sizes(self, objects: list[shapes.Object], my_camera: camera.Camera) -> np.ndarray:
+        """
+        Returns about how many pixels across each object's bounding sphere is on screen
+        """
+        if len(objects) == 0:
+            return np.empty(0)
+        centers = np.array([object.bounding_center for object in objects])
+        radii = np.array([object.bounding_radius for object in objects])
+        distances = np.linalg.norm(centers - np.asarray(my_camera.get_world_pos(), dtype=float)[:3], axis=1)
+
+        # Pixels per unit at a distance, the same scale the projection matrix uses
+        return 2 * radii * self.width * my_camera.focal_length / (my_camera.near_clipping_height * np.maximum(distances, my_camera.focal_length))
+
+    def draw_polygons(self, polygons: list[list[tuple]], colors: list[tuple]):
+        """
+        Clears the surface and draws screen space polygons from process_geometry onto it
+        """
+        with self.profiler.stage("draw"):
+            if self.tile_renderer is not None:
+                Rasterizing.clear_buffers(self.color_buffer_array, self.depth_buffer_array, BLACK)
+                self.tile_renderer.draw_triangles(*Rasterizing.polygons_to_triangles(polygons, colors))
+            elif self.depth_buffer:
+                Rasterizing.clear_buffers(self.color_buffer_array, self.depth_buffer_array, BLACK)
+                Rasterizing.fill_triangles(self.color_buffer_array, self.depth_buffer_array, *Rasterizing.polygons_to_triangles(polygons, colors))
+            else:
+                self.surface.fill(BLACK)
+                for polygon, color in zip(polygons, colors):
+                    pygame.draw.polygon(self.surface, color, polygon)
+
+            if self.depth_buffer:
+                pygame.surfarray.blit_array(self.surface, self.color_buffer_array)
+
+            if self.draw_border:
+                # Screen border for debuging
+                pygame.draw.line(self.surface, WHITE, (0, 0), (self.width, 0))
+                pygame.draw.line(self.surface, WHITE, (self.width, 0), (self.width, self.height))
+                pygame.draw.line(self.surface, WHITE, (self.width, self.height), (0, self.height))
+                pygame.draw.line(self.surface, WHITE, (0, self.height), (0, 0))
+        self.profiler.count("draw", len(polygons), len(polygons))
+
+    def close(self):
+        """
+        Stops the tile rendering workers, if any
+        """
+        if self.tile_renderer is not None:
+            self.tile_renderer.close()
+            self.tile_renderer = None
+
+class FrameStats:
+    """
+    What one frame's geometry came to: the number of objects left after frustum culling and the number of polygons to draw
+    """
+    __slots__ = ("objects_visible", "triangles_drawn")
+
+    def __init__(self, objects_visible: int, triangles_drawn: int) -> None:
+        self.objects_visible = objects_visible
+        self.triangles_drawn = triangles_drawn
+
+def render_camera_path(objects: list[shapes.Object] | bvh.BVH, my_camera: camera.Camera, camera_path: list[tuple], surface: pygame.Surface = None, pipelined: bool = False, **renderer_options) -> tuple[list[float], list[int]]:
+    """
+    Renders one frame for every (world_pos, yaw, pitch) in camera_path, by default into a 600x600 offscreen surface so no window is needed.
+    With pipelined, frames go through a pipeline.FramePipeline, so each frame's geometry overlaps the previous frame's drawing.
+    Returns the time each frame took in seconds and how many triangles each frame drew.
+    """
+    if surface is None:
+        surface = pygame.Surface((600, 600))
+    renderer = Renderer(surface, surface.get_width(), surface.get_height(), **renderer_options)
+    frame_pipeline = pipeline.FramePipeline(renderer) if pipelined else renderer
+
+    frame_times: list[float] = []
+    triangles_drawn: list[int] = []
+    for world_pos, yaw, pitch in camera_path:
+        # Put the camera where the path says it should be
+        current_pos = my_camera.get_world_pos()
+        my_camera.move((world_pos[0] - current_pos[0], world_pos[1] - current_pos[1], world_pos[2] - current_pos[2]))
+        my_camera.yaw = yaw
+        my_camera.pitch = pitch
+
+        start = perf_counter()
+        renderer.profiler.begin_frame()
+        triangles_drawn.append(frame_pipeline.render_frame(objects, my_camera))
+        renderer.profiler.end_frame()
+        frame_times.append(perf_counter() - start)
+
+    if pipelined:
+        # The last frame is still in flight, draw it as part of the last frame's time
+        start = perf_counter()
+        triangles_drawn.append(frame_pipeline.finish())
+        frame_times[-1] += perf_counter() - start
+        triangles_drawn = triangles_drawn[1:]
+        frame_pipeline.close()
+    renderer.close()
+    return frame_times, triangles_drawn
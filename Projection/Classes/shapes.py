@@ -1,21 +1,94 @@
 ### RIGHT HANDED ###
-from Functions import SimpleLinAlg
-from Classes import colliders
+import numpy as np
+from Classes import colliders, mesh, light
+
+# How far past an LOD switching size an object has to get before it switches, so objects right on the edge don't flicker between levels
+LOD_HYSTERESIS = 0.2
 
 class Object:
     """
     Class to be inherited from.
-    Contains a transform / update_transform function, scale, color, and an init_triangles function to be overwritten
+    Contains a transform / update_transform function, scale, color, and an init_mesh function to be overwritten
     """
     def __init__(self, world_pos: tuple, scale: tuple = (1, 1, 1), color: tuple = (255, 255, 255)) -> None:
         self.color = color
         self.world_pos = world_pos
         self.scale = scale
-        self.init_triangles()
+        self.bvh_leaf = None # Leaf of the bvh.BVH the object is in, if any
+
+        # Goes up every time the model matrix changes, world space data cached with an older version is out of date
+        self.transform_version = 0
+        self.world_vertices_version = -1
+        self.world_normals_version = -1
+        self.world_planes_version = -1
+
+        # Goes up when the mesh's colors change, and the light / versions the shaded colors were cached with
+        self.color_version = 0
+        self.shaded_colors_key = None
+
+        self.init_mesh()
+
+        # Detail levels, lod_meshes[0] is the full mesh, level i + 1 is drawn when the object is smaller than lod_screen_sizes[i] pixels on screen
+        self.lod_meshes: list[mesh.Mesh] = [self.mesh]
+        self.lod_screen_sizes: list[float] = []
+        self.lod_level = 0
+
         self.update_transform()
     
-    def init_triangles(self):
-        self.triangles: list[Triangle] = []
+    def init_mesh(self):
+        """
+        Sets self.mesh, the object's model space mesh.Mesh
+        """
+        self.mesh = mesh.Mesh(np.empty((0, 4)), np.empty((0, 3)), self.color)
+
+    def get_colliders(self) -> list[colliders.BoxCollider]:
+        """
+        Returns the box colliders the object blocks movement with, none by default
+        """
+        return []
+
+    def generate_lods(self, screen_sizes: list[float] = [150, 50, 20], pixel_error: float = 4):
+        """
+        Makes a simplified mesh (mesh.simplify_mesh) for each screen size, each one coarser than the last.
+        Each level's vertices move by about pixel_error pixels at most when it's first drawn.
+        """
+        full_mesh = self.lod_meshes[0]
+        extent = float((full_mesh.vertices[:, :3].max(axis=0) - full_mesh.vertices[:, :3].min(axis=0)).max()) if len(full_mesh.vertices) > 0 else 1
+        # The object is screen_size pixels across when a level is first used, so a cell of pixel_error pixels is extent * pixel_error / screen_size
+        self.lod_meshes = [full_mesh] + [mesh.simplify_mesh(full_mesh, extent * pixel_error / screen_size) for screen_size in screen_sizes]
+        self.lod_screen_sizes = list(screen_sizes)
+        self.update_bounds()
+
+    def select_lod(self, screen_size: float):
+        """
+        Picks the detail level for an object that is screen_size pixels across
+        """
+        level = self.lod_level
+        while level < len(self.lod_screen_sizes) and screen_size < self.lod_screen_sizes[level] * (1 - LOD_HYSTERESIS):
+            level += 1
+        while level > 0 and screen_size > self.lod_screen_sizes[level - 1] * (1 + LOD_HYSTERESIS):
+            level -= 1
+        if level != self.lod_level:
+            self.set_lod(level)
+
+    def set_lod(self, level: int):
+        """
+        Switches the mesh to another detail level.
+        The bounds already cover every level (see update_bounds), so they stay the same.
+        """
+        self.lod_level = level
+        self.mesh = self.lod_meshes[level]
+        self.world_vertices_version = -1
+        self.world_normals_version = -1
+        self.world_planes_version = -1
+        self.shaded_colors_key = None
+
+    @property
+    def triangles(self) -> list["Triangle"]:
+        """
+        The mesh as separate model space Triangle objects, for code that works on one triangle at a time
+        """
+        return [Triangle(points, tuple(color)) for points, color in zip(self.mesh.get_triangle_points().tolist(), self.mesh.colors.tolist())]
 
     def update_transform(self):
         """
@@ -39,32 +112,150 @@ class Object:
             [0, 0, 0, 1]
         ]
 
-        self.model_matrix = SimpleLinAlg.matmul(self.translation_matrix, self.scale_matrix)
-        for triangle in self.triangles:
-            triangle.model_matrix = self.model_matrix
+        self.model_matrix = self.get_model_matrix()
+        self.transform_changed()
     
     def move(self, move_by: tuple):
+        if move_by[0] == 0 and move_by[1] == 0 and move_by[2] == 0:
+            return
         self.translation_matrix[0][3] += move_by[0]
         self.translation_matrix[1][3] += move_by[1]
         self.translation_matrix[2][3] += move_by[2]
-        self.model_matrix = SimpleLinAlg.matmul(self.translation_matrix, self.scale_matrix)
+        self.model_matrix = self.get_model_matrix()
+        self.transform_changed()
+
+    def get_model_matrix(self) -> list[list[float]]:
+        """
+        translation_matrix @ scale_matrix, written out since both are mostly zeros (this runs for every object at load)
+        """
+        return [
+            [self.scale_matrix[0][0], 0, 0, self.translation_matrix[0][3]],
+            [0, self.scale_matrix[1][1], 0, self.translation_matrix[1][3]],
+            [0, 0, self.scale_matrix[2][2], self.translation_matrix[2][3]],
+            [0, 0, 0, 1]
+        ]
+
+    def transform_changed(self):
+        """
+        Call after changing the model matrix (or replacing the mesh).
+        Marks the cached world space vertices and normals as out of date and updates the bounds.
+        """
+        self.transform_version += 1
+        self.update_bounds()
+
+    def get_world_vertices(self) -> np.ndarray:
+        """
+        Returns the mesh's vertices in world space as a (v, 4) array.
+        Only recomputed after the transform changes, so static objects pay for it once.
+        """
+        if self.world_vertices_version != self.transform_version:
+            self.world_vertices = self.mesh.vertices @ np.asarray(self.model_matrix, dtype=float).T
+            self.world_vertices_version = self.transform_version
+        return self.world_vertices
+
+    def get_world_normals(self) -> np.ndarray:
+        """
+        Returns the mesh's face normals in world space as a (t, 3) array, cached like get_world_vertices.
+        Normals use the inverse transpose of the model matrix so they stay perpendicular under uneven scaling.
+        """
+        if self.world_normals_version != self.transform_version:
+            normal_matrix = np.linalg.inv(np.asarray(self.model_matrix, dtype=float)[:3, :3]).T
+            normals = self.mesh.normals @ normal_matrix.T
+            lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+            lengths[lengths == 0] = 1
+            self.world_normals = normals / lengths
+            self.world_normals_version = self.transform_version
+        return self.world_normals
+
+    def get_world_planes(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the plane of every face in world space as (t, 3) normals and (t,) offsets, cached like get_world_vertices.
+        A face is facing a point p when normals @ p > offsets, the same faces a cross product of the corners would say.
+        """
+        if self.world_planes_version != self.transform_version:
+            normals = self.get_world_normals()
+            # Mirroring flips the winding, so the face normals have to flip with it
+            if np.linalg.det(np.asarray(self.model_matrix, dtype=float)[:3, :3]) < 0:
+                normals = -normals
+            centroids = self.get_world_vertices()[self.mesh.indices][:, :, :3].mean(axis=1)
+            self.world_planes = (normals, np.einsum("ij,ij->i", normals, centroids))
+            self.world_planes_version = self.transform_version
+        return self.world_planes
+
+    def set_color(self, color: tuple):
+        """
+        Gives every face of the object a new color
+        """
+        self.color = color
+        for lod_mesh in self.lod_meshes:
+            lod_mesh.colors[:] = color
+        self.color_version += 1
+
+    def get_shaded_colors(self, my_light: light.DirectionalLight) -> np.ndarray:
+        """
+        Returns the (t, 3) colors of the object's faces lit by a light.
+        Cached until the light, the object's transform or its colors change.
+        """
+        key = (id(my_light), my_light.version, self.transform_version, self.color_version)
+        if self.shaded_colors_key != key:
+            self.shaded_colors = my_light.shade(self.get_world_normals(), self.mesh.colors)
+            self.shaded_colors_key = key
+        return self.shaded_colors
+
+    def update_bounds(self):
+        """
+        Updates the object's world space bounding box (bounds_min, bounds_max) and the bounding sphere around it (bounding_center, bounding_radius).
+        Used to cull the whole object before any of its triangles are transformed.
+        The bounds cover every detail level, simplified meshes can reach past the full one (like voxels.coarse_mesh blocks).
+        """
+        if len(self.mesh.vertices) == 0:
+            world_points = np.asarray(self.model_matrix, dtype=float)[np.newaxis, :, 3]
+        else:
+            world_points = self.get_world_vertices()
+
+        # The other levels' model space boxes, by their corners
+        other_vertices = [lod_mesh.vertices for lod_mesh in self.lod_meshes if lod_mesh is not self.mesh and len(lod_mesh.vertices) > 0]
+        if len(other_vertices) > 0:
+            other_vertices = np.concatenate(other_vertices)
+            corner_picks = np.array([[(i >> axis) & 1 for axis in range(3)] + [1] for i in range(8)], dtype=bool)
+            corners = np.where(corner_picks, other_vertices.max(axis=0), other_vertices.min(axis=0))
+            world_points = np.concatenate([world_points, corners @ np.asarray(self.model_matrix, dtype=float).T])
+
+        bounds_min = world_points[:, :3].min(axis=0)
+        bounds_max = world_points[:, :3].max(axis=0)
+        self.set_bounds(bounds_min, bounds_max, (bounds_min + bounds_max) / 2, float(np.linalg.norm(bounds_max - bounds_min) / 2))
+
+    def set_bounds(self, bounds_min: np.ndarray, bounds_max: np.ndarray, bounding_center: np.ndarray, bounding_radius: float):
+        """
+        Sets the world space bounding box and the bounding sphere around it to bounds already worked out
+        """
+        self.bounds_min = bounds_min
+        self.bounds_max = bounds_max
+        self.bounding_center = bounding_center
+        self.bounding_radius = bounding_radius
+
+        # Grow / shrink the BVH boxes around the object instead of rebuilding the tree
+        if self.bvh_leaf is not None:
+            self.bvh_leaf.refit()
 
 class Triangle_Object(Object):
     def __init__(self, world_pos: tuple = (0, 0, 0), scale: tuple = (1, 1, 1), color: tuple = (255, 255, 255)) -> None:
         super().__init__(world_pos, scale, color)
     
-    def init_triangles(self):
-        self.triangles: list[Triangle] = []
-
+    def init_mesh(self):
         bottom = -1
         top = 1
         left = -1
         middle = 0
         right = 1
 
-        self.triangles.append(Triangle([[left, bottom, middle, 1], [left, top, middle, 1], [right, bottom, middle, 1]]))
+        vertices = [
+            [left, bottom, middle, 1], # 0: left bottom
+            [left, top, middle, 1], # 1: left top
+            [right, bottom, middle, 1] # 2: right bottom
+        ]
 
-        self.triangles[0].fourth_corner = [right, top, middle, 1]
+        self.mesh = mesh.Mesh(vertices, [[0, 1, 2]], self.color)
 
 class Cube(Object):
     def __init__(self, world_pos: tuple = (0, 0, 0), scale: tuple = (1, 1, 1), color: tuple = (255, 255, 255), faces: dict[str, bool] = {"front": True, "right": True, "back": True, "left": True, "top": True, "bottom": True}) -> None:
@@ -76,9 +267,10 @@ class Cube(Object):
         super().__init__(world_pos, scale, color)
         self.collider = colliders.BoxCollider(self.world_pos, self.scale)
 
-    def init_triangles(self):
-        self.triangles: list[Triangle] = []
+    def get_colliders(self) -> list[colliders.BoxCollider]:
+        return [self.collider]
 
+    def init_mesh(self):
         # Constants
         left = -0.5
         right = 0.5
@@ -87,147 +279,97 @@ class Cube(Object):
         back = -0.5
         front = 0.5
 
-        if self.faces["front"]:
-            # Front face: x, y, front
-                # Left bottom triangle
-                # 1: left bottom front
-                # 2: left top front
-                # 3: right bottom front
-            self.triangles.append(Triangle(([left, bottom, front, 1], [right, bottom, front, 1], [left, top, front, 1]), self.color))
-
-                # Right top triangle
-                # 1: right top front
-                # 2: right bottom front
-                # 3: left top front
-            self.triangles.append(Triangle(([right, top, front, 1], [left, top, front, 1], [right, bottom, front, 1]), self.color))
-
-        if self.faces["top"]:
-            # Top face: x, top, z
-                # Left top front triangle
-                # 1: left top front
-                # 2: right top front
-                # 3: left top back
-            self.triangles.append(Triangle(([left, top, front, 1], [right, top, front, 1], [left, top, back, 1]), self.color))
-
-                # Right top back triangle
-                # 1: right top back
-                # 2: left top back
-                # 3: right top front
-            self.triangles.append(Triangle(([right, top, back, 1], [left, top, back, 1], [right, top, front, 1]), self.color))
-
-        if self.faces["back"]:
-            # Back face: x, y, back
-                # Left top back triangle
-                # 1: left top back
-                # 2: right top back
-                # 3: left bottom back
-            self.triangles.append(Triangle(([left, top, back, 1], [right, top, back, 1], [left, bottom, back, 1]), self.color))
-
-                # Right bottom back triangle
-                # 1: right bottom back
-                # 2: left bottom back
-                # 3: right top back
-            self.triangles.append(Triangle(([right, bottom, back, 1], [left, bottom, back, 1], [right, top, back, 1]), self.color))
-        
-        if self.faces["bottom"]:
-            # Bottom face: x, bottom, z
-                # Left bottom front triangle
-                # 1: left bottom front
-                # 2: right bottom front
-                # 3: left bottom back
-            self.triangles.append(Triangle(([left, bottom, front, 1], [left, bottom, back, 1], [right, bottom, front, 1]), self.color))
-
-                # Right bottom back triangle
-                # 1: right bottom back
-                # 2: left bottom back
-                # 3: right bottom front
-            self.triangles.append(Triangle(([right, bottom, back, 1], [right, bottom, front, 1], [left, bottom, back, 1]), self.color))
-
-        if self.faces["right"]:
-            # Right face: right, y, z
-                # Bottom front triangle
-                # 1: right bottom front
-                # 2: right top front
-                # 3: right bottom back
-            self.triangles.append(Triangle(([right, bottom, front, 1], [right, bottom, back, 1], [right, top, front, 1]), self.color))
-
-                # Top back triangle
-                # 1: right top back
-                # 2: right bottom back
-                # 3: right top front
-            self.triangles.append(Triangle(([right, top, back, 1], [right, top, front, 1], [right, bottom, back, 1]), self.color))
-        
-        if self.faces["left"]:
-            # Left face: left, y, z
-                # Bottom front triangle
-                # 1: left bottom front
-                # 2: left top front
-                # 3: left bottom back
-            self.triangles.append(Triangle(([left, bottom, front, 1], [left, top, front, 1], [left, bottom, back, 1]), self.color))
-
-                # Top back triangle
-                # 1: left top back
-                # 2: left bottom back
-                # 3: left top front
-            self.triangles.append(Triangle(([left, top, back, 1], [left, bottom, back, 1], [left, top, front, 1]), self.color))
-
-        for i in range(len(self.triangles)):
-            if i == 11:
-                self.triangles[i].fourth_corner = [left, bottom, front, 1]
-            else:
-                if i % 2 == 0: # If i is even
-                    self.triangles[i].fourth_corner = self.triangles[i + 1].points[0]
-                else:
-                    self.triangles[i].fourth_corner = self.triangles[i - 1].points[0]
+        # The 8 corners, shared by every face
+        vertices = [
+            [left, bottom, front, 1], # 0: left bottom front
+            [right, bottom, front, 1], # 1: right bottom front
+            [left, top, front, 1], # 2: left top front
+            [right, top, front, 1], # 3: right top front
+            [left, bottom, back, 1], # 4: left bottom back
+            [right, bottom, back, 1], # 5: right bottom back
+            [left, top, back, 1], # 6: left top back
+            [right, top, back, 1] # 7: right top back
+        ]
+
+        # 2 triangles per face, corners in the same order as the vertices list
+        face_indices = {
+            "front": [[0, 1, 2], [3, 2, 1]],
+            "top": [[2, 3, 6], [7, 6, 3]],
+            "back": [[6, 7, 4], [5, 4, 7]],
+            "bottom": [[0, 4, 1], [5, 1, 4]],
+            "right": [[1, 5, 3], [7, 3, 5]],
+            "left": [[0, 2, 4], [6, 4, 2]]
+        }
+
+        indices = []
+        for face in ["front", "top", "back", "bottom", "right", "left"]:
+            if self.faces[face]:
+                indices += face_indices[face]
+
+        self.mesh = mesh.Mesh(vertices, indices, self.color)
 
 class Plane(Object):
     def __init__(self, world_pos: tuple = (0, 0, 0), scale: tuple = (1, 1, 1), color = (0, 0, 255)):
-        self.color = color
-        self.init_triangles()
-        self.update_transform(world_pos, scale)
-        self.scale = scale
-
-    def init_triangles(self):
-        self.triangles: list[Triangle] = []
+        super().__init__(world_pos, scale, color)
 
+    def init_mesh(self):
         # Constants
         left = -1
         right = 1
         bottom = -1
         top = 1
-        #back = -1
-        #front = 1
         middle = 0
 
-        # Front bottom left triangle
-            # 1: front bottom left
-            # 2: front bottom right
-            # 3: front top left
-        self.triangles.append(Triangle(([left, bottom, middle, 1], [right, bottom, middle, 1], [left, top, middle, 1]), self.color))
-        
-        # Front top right triangle
-            # 1: front top right
-            # 2: front top left
-            # 3: front bottom right
-        self.triangles.append(Triangle(([right, top, middle, 1], [left, top, middle, 1], [right, bottom, middle, 1]), self.color))
-
-        self.triangles[0].fourth_corner = self.triangles[1].points[0]
-        self.triangles[1].fourth_corner = self.triangles[0].points[0]
+        vertices = [
+            [left, bottom, middle, 1], # 0: bottom left
+            [right, bottom, middle, 1], # 1: bottom right
+            [left, top, middle, 1], # 2: top left
+            [right, top, middle, 1] # 3: top right
+        ]
+
+        # Bottom left triangle and top right triangle
+        self.mesh = mesh.Mesh(vertices, [[0, 1, 2], [3, 2, 1]], self.color)
+
+class Mesh_Object(Object):
+    """
+    An object made from an already built mesh.Mesh, like a mesh loaded from a file.
+    box_colliders are world space box colliders to block movement with, if any.
+    bounds are the (bounds_min, bounds_max, bounding_center, bounding_radius) update_bounds would give at world_pos and scale, if already known (like for a whole scene at once), so the world vertices don't have to be worked out to find them.
+    """
+    def __init__(self, object_mesh: mesh.Mesh, world_pos: tuple = (0, 0, 0), scale: tuple = (1, 1, 1), color: tuple = None, box_colliders: list[colliders.BoxCollider] = None, bounds: tuple[np.ndarray, np.ndarray, np.ndarray, float] = None) -> None:
+        self.given_mesh = object_mesh
+        self.given_bounds = bounds
+        self.box_colliders = box_colliders if box_colliders is not None else []
+        if color is None:
+            color = tuple(object_mesh.colors[0].tolist()) if len(object_mesh) > 0 else (255, 255, 255)
+        super().__init__(world_pos, scale, color)
+
+    def init_mesh(self):
+        self.mesh = self.given_mesh
+
+    def update_bounds(self):
+        # The given bounds are only right for the transform the object was made with
+        if self.given_bounds is not None:
+            self.set_bounds(*self.given_bounds)
+            self.given_bounds = None
+        else:
+            super().update_bounds()
+
+    def get_colliders(self) -> list[colliders.BoxCollider]:
+        return self.box_colliders
 
 class Triangle:
     """
     To be used in other classes. To make a single triangle object, use the triangle object class
     """
+    __slots__ = ("color", "points", "center_coord")
+
     def __init__(self, verticies: tuple[tuple], color: tuple = (255, 255, 255)) -> None:
         self.color = color
-        self.model_matrix = [[
-            0
-        ]]
         a = verticies[0]
         b = verticies[1]
         c = verticies[2]
         self.points = [a, b, c]
-        self.world_points = []
         center_x = (self.points[0][0] + self.points[1][0] + self.points[2][0]) / 3
         center_y = (self.points[0][1] + self.points[1][1] + self.points[2][1]) / 3
         center_z = (self.points[0][2] + self.points[1][2] + self.points[2][2]) / 3
@@ -0,0 +1,109 @@
+import multiprocessing
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from Functions import Rasterizing
+
+class TileRenderer:
+    """
+    Rasterizes screen triangles with a pool of worker processes.
+    The color and depth buffers live in shared memory, the screen is split into tile_size x tile_size tiles and each worker fills whole tiles straight into the buffers.
+    Tiles don't overlap, so workers never write to the same pixels and no locking is needed.
+    Call close() when done with it, the shared memory isn't freed otherwise.
+    Workers are started fresh (forkserver, or spawn where there's no forkserver) instead of forked from this process, which has SDL and other threads running.
+    They import the main script, so it has to keep its work behind an if __name__ == "__main__": check.
+    If a worker dies (like from a SIGTERM sent to the whole process group), draw_triangles() raises concurrent.futures.process.BrokenProcessPool instead of waiting on it.
+    """
+    def __init__(self, size: tuple[int, int], workers: int, tile_size: int = 64, timeout: float = 10) -> None:
+        self.size = size
+        self.tile_size = tile_size
+
+        # Longest a frame's tiles can take before the workers count as stuck
+        self.timeout = timeout
+
+        # Indexed [x, y] like pygame.surfarray, the same layout as Renderer's own buffers
+        self.color_memory = shared_memory.SharedMemory(create=True, size=size[0] * size[1] * 3)
+        self.depth_memory = shared_memory.SharedMemory(create=True, size=size[0] * size[1] * np.dtype(float).itemsize)
+        self.color_buffer = np.ndarray((*size, 3), dtype=np.uint8, buffer=self.color_memory.buf)
+        self.depth_buffer = np.ndarray(size, dtype=float, buffer=self.depth_memory.buf)
+
+        # A forked copy of a process with threads can deadlock on a lock one of the other threads held
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        context = multiprocessing.get_context(start_method)
+        self.executor = ProcessPoolExecutor(workers, mp_context=context, initializer=attach_buffers, initargs=(self.color_memory.name, self.depth_memory.name, size))
+
+    def get_tiles(self) -> list[tuple[int, int, int, int]]:
+        """
+        Returns every tile's (min_x, min_y, max_x, max_y) pixel rectangle
+        """
+        tiles = []
+        for min_x in range(0, self.size[0], self.tile_size):
+            for min_y in range(0, self.size[1], self.tile_size):
+                tiles.append((min_x, min_y, min(min_x + self.tile_size, self.size[0]), min(min_y + self.tile_size, self.size[1])))
+        return tiles
+
+    def bin_triangles(self, triangles: np.ndarray) -> list[tuple[tuple, np.ndarray]]:
+        """
+        Given (n, 3, 2/3) screen triangles, returns (tile, indices) for every tile that has triangles overlapping it.
+        Indices stay in draw order.
+        """
+        bounds_min = triangles[:, :, :2].min(axis=1)
+        bounds_max = triangles[:, :, :2].max(axis=1)
+
+        bins = []
+        for tile in self.get_tiles():
+            overlapping = (bounds_max[:, 0] >= tile[0]) & (bounds_min[:, 0] < tile[2]) & (bounds_max[:, 1] >= tile[1]) & (bounds_min[:, 1] < tile[3])
+            indices = np.flatnonzero(overlapping)
+            if len(indices) > 0:
+                bins.append((tile, indices))
+        return bins
+
+    def draw_triangles(self, triangles: np.ndarray, colors: np.ndarray):
+        """
+        Fills (n, 3, 3) (x, y, 1/z) screen triangles with their (n, 3) colors into the shared buffers, waiting until every tile is done.
+        Raises TimeoutError if that takes longer than timeout, like when a worker got stuck.
+        """
+        if len(triangles) == 0:
+            return
+        tasks = [(tile, triangles[indices], colors[indices]) for tile, indices in self.bin_triangles(triangles)]
+        for _ in self.executor.map(rasterize_tile, tasks, timeout=self.timeout):
+            pass
+
+    def close(self):
+        """
+        Stops the workers and frees the shared buffers
+        """
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        del self.color_buffer, self.depth_buffer
+        for memory in (self.color_memory, self.depth_memory):
+            memory.close()
+            memory.unlink()
+
+# The shared buffers as seen from inside a worker process, set by attach_buffers
+worker_memory: list[shared_memory.SharedMemory] = []
+worker_color_buffer: np.ndarray = None
+worker_depth_buffer: np.ndarray = None
+
+def attach_buffers(color_name: str, depth_name: str, size: tuple[int, int]):
+    """
+    Runs once in each worker process, opens the shared color and depth buffers
+    """
+    # SIGTERM stops a worker like any other process, whatever handler it may have picked up (like SDL's, which only queues a quit event)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    # Ctrl-C goes to the whole process group, only the main process should handle it and shut the workers down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    global worker_color_buffer, worker_depth_buffer
+    worker_memory.append(shared_memory.SharedMemory(name=color_name))
+    worker_memory.append(shared_memory.SharedMemory(name=depth_name))
+    worker_color_buffer = np.ndarray((*size, 3), dtype=np.uint8, buffer=worker_memory[0].buf)
+    worker_depth_buffer = np.ndarray(size, dtype=float, buffer=worker_memory[1].buf)
+
+def rasterize_tile(task: tuple[tuple, np.ndarray, np.ndarray]):
+    """
+    Runs in a worker, fills one tile's triangles into the shared buffers
+    """
+    tile, triangles, colors = task
+    Rasterizing.fill_triangles(worker_color_buffer, worker_depth_buffer, triangles, colors, tile)
@@ -0,0 +1,165 @@
+import numpy as np
+from Classes import shapes, mesh, colliders
+
+class VoxelGrid(shapes.Object):
+    """
+    A block world built from a 3d array of cells. cells[x, y, z] is 0 for air, otherwise an index into palette for the block's color.
+    Cell (x, y, z) is a 1x1x1 block centered on world_pos + (x, y, z), the same place a Cube with that world_pos would be.
+    Faces between 2 solid cells are never made, and touching faces of the same color that face the same way are merged into bigger rectangles (greedy meshing).
+    """
+    def __init__(self, cells, palette: list[tuple], world_pos: tuple = (0, 0, 0), neighbors=None) -> None:
+        """
+        neighbors is an optional copy of cells with 1 extra cell on every side, used to hide faces against blocks outside the grid (like the next chunk over).
+        Without it, everything outside the grid counts as air.
+        """
+        self.cells = np.asarray(cells)
+        self.palette = palette
+        self.neighbors = neighbors
+        super().__init__(world_pos, (1, 1, 1), palette[1] if len(palette) > 1 else (255, 255, 255))
+
+    def init_mesh(self):
+        self.mesh = greedy_mesh(self.cells, self.palette, self.neighbors)
+
+    def generate_lods(self, screen_sizes: list[float] = [200, 100]):
+        """
+        Makes a coarser mesh for each screen size, level i + 1 is built from blocks (2 ** (i + 1)) cells across (see downsample_cells).
+        Faces against the neighbors stay hidden, but the coarse surface doesn't line up exactly with chunks drawn at other levels.
+        """
+        self.lod_meshes = [self.lod_meshes[0]]
+        for level in range(len(screen_sizes)):
+            self.lod_meshes.append(coarse_mesh(self.cells, self.palette, 2 ** (level + 1), self.neighbors))
+        self.lod_screen_sizes = list(screen_sizes)
+        self.update_bounds()
+
+    def get_colliders(self, surface_only: bool = False) -> list[colliders.BoxCollider]:
+        """
+        Returns a box collider for every solid cell.
+        With surface_only, cells with solid cells on all 6 sides are left out, nothing can reach them without hitting one of those first.
+        """
+        solid = self.cells != 0
+        if surface_only:
+            solid = solid & np.any([exposed != 0 for axis, direction, exposed in get_exposed_faces(self.cells, self.neighbors)], axis=0)
+        solid = np.argwhere(solid)
+        origin = np.asarray(self.world_pos, dtype=float)
+        return [colliders.BoxCollider(tuple(origin + cell)) for cell in solid]
+
+def get_exposed_faces(cells: np.ndarray, neighbors: np.ndarray = None) -> list[tuple[int, int, np.ndarray]]:
+    """
+    Returns (axis, direction, exposed) for the 6 face directions.
+    exposed[x, y, z] is the cell's palette index where the cell is solid and the cell next to it in that direction is air, otherwise 0.
+    """
+    if neighbors is None:
+        neighbors = np.pad(cells, 1)
+    is_air = neighbors == 0
+
+    faces = []
+    for axis in range(3):
+        for direction in (1, -1):
+            # The cell next to each cell in this direction, taken from the padded array
+            slices = [slice(1, -1)] * 3
+            slices[axis] = slice(1 + direction, neighbors.shape[axis] - 1 + direction)
+            exposed = np.where(is_air[tuple(slices)], cells, 0)
+            faces.append((axis, direction, exposed))
+    return faces
+
+def greedy_rectangles(layer: np.ndarray) -> list[tuple[int, int, int, int, int]]:
+    """
+    Splits a 2d array of palette indices into as few same-valued rectangles as the greedy method finds, ignoring 0s.
+    Returns (u, v, width, height, value) for each rectangle.
+    Changes the given array.
+    """
+    rectangles = []
+    width, height = layer.shape
+    for u, v in zip(*np.nonzero(layer.T)[::-1]):
+        value = layer[u, v]
+        if value == 0: # Already part of an earlier rectangle
+            continue
+
+        # Grow along u, then along v while the whole row matches
+        w = 1
+        while u + w < width and layer[u + w, v] == value:
+            w += 1
+        h = 1
+        while v + h < height and np.all(layer[u:u + w, v + h] == value):
+            h += 1
+
+        layer[u:u + w, v:v + h] = 0
+        rectangles.append((u, v, w, h, value))
+    return rectangles
+
+def greedy_mesh(cells: np.ndarray, palette: list[tuple], neighbors: np.ndarray = None) -> mesh.Mesh:
+    """
+    Builds the visible faces of a voxel grid as a mesh, merging same colored faces that face the same way into rectangles
+    """
+    vertices = []
+    indices = []
+    colors = []
+
+    for axis, direction, exposed in get_exposed_faces(cells, neighbors):
+        # The 2 axes the faces lie along, picked so u x v points along +axis
+        u_axis = (axis + 1) % 3
+        v_axis = (axis + 2) % 3
+
+        for layer_index in np.nonzero(exposed.any(axis=tuple(i for i in range(3) if i != axis)))[0]:
+            layer = np.take(exposed, layer_index, axis=axis)
+            # np.take removes the axis, the other 2 stay in order, so the layer's axes are u, v or v, u
+            if u_axis > v_axis:
+                layer = layer.T
+            layer = layer.copy()
+
+            for u, v, w, h, value in greedy_rectangles(layer):
+                corner = np.zeros(3)
+                corner[axis] = layer_index + direction * 0.5
+                corner[u_axis] = u - 0.5
+                corner[v_axis] = v - 0.5
+                u_side = np.zeros(3)
+                u_side[u_axis] = w
+                v_side = np.zeros(3)
+                v_side[v_axis] = h
+
+                start = len(vertices)
+                for point in (corner, corner + u_side, corner + v_side, corner + u_side + v_side):
+                    vertices.append([point[0], point[1], point[2], 1])
+
+                # Same winding as Cube, so normals point out of the block
+                if direction == 1:
+                    indices += [[start, start + 1, start + 2], [start + 3, start + 2, start + 1]]
+                else:
+                    indices += [[start, start + 2, start + 1], [start + 3, start + 1, start + 2]]
+                colors += [palette[value], palette[value]]
+
+    return mesh.Mesh(np.array(vertices).reshape(-1, 4), np.array(indices).reshape(-1, 3), np.array(colors).reshape(-1, 3))
+
+def downsample_cells(cells: np.ndarray, factor: int) -> np.ndarray:
+    """
+    Merges every factor x factor x factor block of cells into one cell, the sizes have to be multiples of factor.
+    A block is solid if any of its cells are, and takes the color of its highest solid cell so the tops of hills keep their color.
+    """
+    size_x, size_y, size_z = (size // factor for size in cells.shape)
+    blocks = cells.reshape(size_x, factor, size_y, factor, size_z, factor)
+    # Put each block's cells last, highest y first
+    blocks = blocks[:, :, :, ::-1].transpose(0, 2, 4, 3, 1, 5).reshape(size_x, size_y, size_z, factor ** 3)
+    first_solid = np.argmax(blocks != 0, axis=3)
+    return np.take_along_axis(blocks, first_solid[..., np.newaxis], axis=3)[..., 0]
+
+def coarse_mesh(cells: np.ndarray, palette: list[tuple], factor: int, neighbors: np.ndarray = None) -> mesh.Mesh:
+    """
+    Builds a lower detail mesh of a voxel grid out of blocks factor cells across, placed over the same space as the full grid
+    """
+    # Fill the grid up with air to a multiple of factor
+    padding = [(0, -size % factor) for size in cells.shape]
+    if any(after != 0 for before, after in padding):
+        cells = np.pad(cells, padding)
+        neighbors = None
+
+    coarse_neighbors = None
+    if neighbors is not None:
+        # Stretching the 1 cell border of neighbors to factor cells makes it downsample into a 1 block border
+        coarse_neighbors = downsample_cells(np.pad(neighbors, factor - 1, mode="edge"), factor)
+    coarse_cells = downsample_cells(cells, factor)
+
+    # Block (x, y, z) covers cells factor * (x, y, z) to factor * (x, y, z) + factor - 1
+    coarse = greedy_mesh(coarse_cells, palette, coarse_neighbors)
+    vertices = coarse.vertices.copy()
+    vertices[:, :3] = vertices[:, :3] * factor + (factor - 1) / 2
+    return mesh.Mesh(vertices, coarse.indices, coarse.colors, coarse.normals)
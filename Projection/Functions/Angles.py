@@ -1,4 +1,5 @@
 import math
+import numpy as np
 from math import sin, cos, tan, pi
 from Functions import SimpleLinAlg
 
@@ -18,6 +19,23 @@ def convex_hull(points: list[list[float]]) -> list[list[float]]:
             hull.pop(-2)
     return hull
 
+def order_triangles(triangles: np.ndarray) -> np.ndarray:
+    """
+    Given an (n, 3, 2/3) array of screen triangles, returns them with their points in the order convex_hull would give, for all of them at once.
+    That's starting from the point with the smallest x (then y) and going the way that gives a positive cross product.
+    """
+    x = triangles[:, :, 0]
+    y = triangles[:, :, 1]
+    # Smallest x, ties broken by smallest y
+    start = np.argmin(np.where(x == x.min(axis=1, keepdims=True), y, np.inf), axis=1)
+
+    rows = np.arange(len(triangles))[:, np.newaxis]
+    order = (start[:, np.newaxis] + np.arange(3)) % 3
+    ordered = triangles[rows, order]
+    flipped = cross_product_3(ordered[:, 0].T, ordered[:, 1].T, ordered[:, 2].T) < 0
+    ordered[flipped] = ordered[flipped][:, [0, 2, 1]]
+    return ordered
+
 def cross_product_3(p1, p2, p3):
     return ((p2[0] - p1[0])*(p3[1] - p1[1])) - ((p2[1] - p1[1])*(p3[0] - p1[0]))
 
@@ -51,6 +69,27 @@ def rotate_yaw(point: tuple, yaw: float) -> tuple:
     rotated_z = x * sin(yaw) + z * cos(yaw)
     return (rotated_x, point[1], rotated_z, 1)
 
+def get_rotation_matrix(yaw: float, pitch: float) -> np.ndarray:
+    """
+    Returns the 4x4 matrix that rotates a point by a yaw and then a pitch.
+    Does the same thing as rotate_yaw followed by rotate_pitch, but can be applied to many points while only computing sin / cos once.
+    """
+    yaw_matrix = np.array([
+        [cos(yaw), 0, -sin(yaw), 0],
+        [0, 1, 0, 0],
+        [sin(yaw), 0, cos(yaw), 0],
+        [0, 0, 0, 1]
+    ])
+
+    pitch_matrix = np.array([
+        [1, 0, 0, 0],
+        [0, cos(pitch), -sin(pitch), 0],
+        [0, sin(pitch), cos(pitch), 0],
+        [0, 0, 0, 1]
+    ])
+
+    return pitch_matrix @ yaw_matrix
+
 def find_movement(yaw: float, speed: float) -> tuple[float]:
     """
     Given a yaw, this finds the vector3 of a line with a magnitude of speed pointing in the given angle.
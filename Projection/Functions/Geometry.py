@@ -1,4 +1,5 @@
 import math
+import numpy as np
 from Classes import shapes
 from Functions import SimpleLinAlg
 
@@ -9,6 +10,21 @@ def get_centroid(triangle: list[float]) -> list[float]:
     average_z = (triangle[0][2] + triangle[1][2] + triangle[2][2]) / 3
     return [average_x, average_y, average_z]
 
+def get_triangle_centroids(triangle_points: np.ndarray) -> np.ndarray:
+    """Given an (n, 3, 3/4) array of triangles, returns the (n, 3) mean of each triangle's points"""
+    return triangle_points[:, :, :3].mean(axis=1)
+
+def get_triangle_normals(triangle_points: np.ndarray) -> np.ndarray:
+    """
+    Given an (n, 3, 3/4) array of triangles, returns each triangle's normalized normal as an (n, 3) array.
+    Points the same way as SimpleLinAlg.get_plane_normal.
+    """
+    a = triangle_points[:, 0, :3]
+    normals = np.cross(triangle_points[:, 1, :3] - a, triangle_points[:, 2, :3] - a)
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    lengths[lengths == 0] = 1 # Degenerate triangles keep a zero normal
+    return normals / lengths
+
 def get_points_by_distance(objects: list[shapes.Object], view_matrix):
     """
     Given a list of objects, returns a list of their triangles in order of farthest to closest
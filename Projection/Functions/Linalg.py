@@ -1,25 +1,41 @@
-from Functions import SimpleLinAlg
-from Functions import Geometry
-from Functions import Angles
-from Classes import camera
+import numpy as np
+from Classes import camera, shapes
 
-def is_triangle_visible(triangle_points: list[list], camera):
-    """Given a triangle's points in view space, returns whether or not the triangle is visible"""
-    lines = []
-    lines.append([triangle_points[0], triangle_points[1]])
-    lines.append([triangle_points[1], triangle_points[2]])
-    lines.append([triangle_points[2], triangle_points[0]])
+def cull_objects(objects: list[shapes.Object], camera: camera.Camera) -> list[shapes.Object]:
+    """
+    Returns the objects whose bounding spheres are at least partly in the camera's view frustum.
+    Runs before any triangles are transformed, so objects that are off screen cost almost nothing.
+    """
+    if len(objects) == 0:
+        return []
+
+    view_matrix = camera.view_matrix
+    centers = np.array([object.bounding_center for object in objects])
+    radii = np.array([object.bounding_radius for object in objects])
+
+    # The view matrix is rigid, so the radii stay the same in view space
+    view_centers = centers @ view_matrix[:3, :3].T + view_matrix[:3, 3]
+    is_visible = camera.frustum.are_spheres_visible(view_centers, radii)
 
-    return are_points_in_frustum(triangle_points, camera) or do_lines_intersect(lines, camera) # Giving True when triangle is outside F I X M E??
+    return [object for object, visible in zip(objects, is_visible) if visible]
 
-def are_points_in_frustum(points, camera):
+def are_triangles_visible(triangle_points: np.ndarray, camera: camera.Camera) -> np.ndarray:
     """
-    Given a triangle, this will return whether any of the triangle's points are within the frusum
+    Given an (n, 3, 3/4) array of view space triangles, returns whether each one is visible.
+    Triangles with a point inside or all points outside one plane are decided for the whole batch at once,
+    only the few left over get their edges checked one at a time.
     """
-    for point in points:
-        if is_point_in_frustum(point, camera):
-            return True
-    return False
+    outcodes = camera.frustum.classify(triangle_points.reshape(-1, triangle_points.shape[2])).reshape(-1, 3)
+
+    has_point_inside = np.any(outcodes == 0, axis=1)
+    is_outside_one_plane = (outcodes[:, 0] & outcodes[:, 1] & outcodes[:, 2]) != 0
+    is_visible = has_point_inside
+
+    for i in np.flatnonzero(~has_point_inside & ~is_outside_one_plane):
+        points = triangle_points[i].tolist()
+        is_visible[i] = do_lines_intersect([[points[0], points[1]], [points[1], points[2]], [points[2], points[0]]], camera)
+
+    return is_visible
 
 def is_point_in_frustum(point: list[float], camera: camera.Camera) -> bool:
     """
@@ -27,264 +43,63 @@ def is_point_in_frustum(point: list[float], camera: camera.Camera) -> bool:
     """
     # Makes sure that a point is in front of all the plane's normals
     # Plane's normals point inward
-
-    # Convert to 3x1 point
-    point = [point[0], point[1], point[2]]
-
-    for plane in camera.planes:
-        if not SimpleLinAlg.is_point_infront_of_plane(plane, point):
-            return False
-    return True
+    return camera.frustum.is_point_inside(point)
 
 def do_lines_intersect(lines, camera: camera.Camera):
     """
     Returns whether or not a bunch of line segments intersect the camera frustum
     """
     for line in lines:
-        for plane in camera.planes:
+        start_distances, end_distances = camera.frustum.plane_distances(line)
+        for start_distance, end_distance in zip(start_distances, end_distances):
+
+            # The segment only meets the plane if its ends are on different sides
+            if (start_distance < 0) == (end_distance < 0) or start_distance == end_distance:
+                continue
 
-            # Get the line's intersection points with the current plane
-            does_intersect, intersection_point = line_seg_plane_intersect_info(line, plane)
+            # Get the line's intersection point with the current plane
+            t = start_distance / (start_distance - end_distance)
+            intersection_point = [line[0][i] + t * (line[1][i] - line[0][i]) for i in range(3)]
 
-            if does_intersect and is_point_in_frustum(intersection_point, camera):
+            if is_point_in_frustum(intersection_point, camera):
                 return True
     return False
 
-def order_points(points):
-    """Given a list of points on a convex polygon in 3d space, returns the points ordered"""
-    points = SimpleLinAlg.four_to_three_dim_list(points)
-
-    # Get the two fixed points to compare against
-    center_point = SimpleLinAlg.mean_of_points(points)
-    top_point = points[0]
-    top_vector = SimpleLinAlg.vecSub(top_point, center_point)
-
-    # Get all points' angles
-    # Take the dot product of the vector of (centroid to first point) against (centroid to current point)
-    point_angles = []
-    for point in points:
-        #angle = Angles.angle_from_3_points([top_point, center_point, point])
-        #point_angles.append([point, angle])
-        v = SimpleLinAlg.vecSub(point, center_point)
-        dot = SimpleLinAlg.dotProd(top_vector, v)
-        point_angles.append([point, dot])
-
-    # Sort and get the points
-    point_angles.sort(key=lambda x: x[1]) # Sorts by angle
-    points = []
-    for point_angle in point_angles:
-        points.append(point_angle[0])
-
-    return points
-    
-# def new_clip_triangle(triangle_points: list[list[float]], camera: camera.Camera) -> list[list[float]]:
-#     """Takes a triangle and clips it to the view frustum using the Sutherland-Hodgeman triangle clipping algorithm"""
-#     output_points = triangle_points
-
-#     # Clip against each plane
-#     for plane in camera.planes:
-#         input_points = Angles.convex_hull(output_points)
-#         output_points = []
-
-#         # Get lines
-#         lines = []
-#         for i in range(len(input_points)):
-#             lines.append([input_points[i], input_points[(i + 1) % len(input_points)]])
-
-#         for line in lines:
-#             for point in line:
-#                 # Don't clip points that are already in
-
-#                 # Check if point is in list already
-#                 is_in_list = False
-#                 for clipped_point in clipped_points:
-#                     if SimpleLinAlg.four_to_three_dim(clipped_point) == SimpleLinAlg.four_to_three_dim(point):
-#                         is_in_list = True
-#                         break
-
-#                 if SimpleLinAlg.is_point_infront_of_plane(plane, point) and not is_in_list:
-#                     clipped_points.append(point)
-
-#             # Line intersections
-#             intersection_point = SimpleLinAlg.get_line_plane_intersect_point(line, plane[0], SimpleLinAlg.get_plane_normal(plane))
-#             if type(intersection_point) != type(None):
-#                 clipped_points.append(intersection_point)
-#     return points
-
-def clip_triangle(triangle_points: list[list[float]], camera: camera.Camera) -> list[list[float]]:
-    """Takes a triangle and clips it to the view frustum using the Sutherland-Hodgeman triangle clipping algorithm. Returns None if there was a problem"""
-    output_points = triangle_points
-
-    # Clip against each plane
-    for plane in camera.planes:
-        if len(output_points) == 0:
-             return None
-        input_points = Angles.convex_hull(output_points)
-        output_points = []
-
-        for i in range(len(input_points)):
-            current_point = input_points[i]
-            prev_point = input_points[(i - 1) % len(input_points)]
-
-            intersection = SimpleLinAlg.get_line_plane_intersect_point([prev_point, current_point], plane[0], SimpleLinAlg.get_plane_normal(plane))
-
-            if (SimpleLinAlg.is_point_infront_of_plane(plane, current_point)):
-                if (not SimpleLinAlg.is_point_infront_of_plane(plane, prev_point)):
-                    output_points.append(intersection)
-                output_points.append(current_point)
-            elif (SimpleLinAlg.is_point_infront_of_plane(plane, prev_point)):
-                output_points.append(intersection)
-
-    return output_points
-
-# def clip_triangle(triangle_points: list[list[float]], camera: camera.Camera) -> list[list[float]]:
-#     # get lines
-#     line_1 = [triangle_points[0], triangle_points[1]]
-#     line_2 = [triangle_points[1], triangle_points[2]]
-#     line_3 = [triangle_points[2], triangle_points[0]]
-#     lines = [line_1, line_2, line_3]
-
-#     insidePoints = 0
-
-#     # If triangle doesn't need to be clipped
-#     if not do_lines_intersect(lines, camera):
-#         return triangle_points
-    
-#     # Don't clip points that are already inside
-#     for point in triangle_points:
-#         if is_point_in_frustum(point, camera):
-#             insidePoints += 1
-
-#     final_points: list[list[float]] = []
-#     clipped_to_planes = []
-
-#     for line in lines:
-
-#         # Intersections with the frustum for each line
-#         line_plane_intersections = line_seg_frustum_intersections(line, camera)
-
-#         # For every point/plane intersection
-#         for line_plane_intersection in line_plane_intersections:
-#             final_points.append(line_plane_intersection[0])
-
-#             # Log a new plane being clipped to
-#             if not line_plane_intersection[1] in clipped_to_planes:
-#                 clipped_to_planes.append(line_plane_intersection[1])
-
-#         # Already visible points
-#         for point in line:
-#             if len(final_points) > 0:
-
-#                 # Check for duplicate
-#                 is_in_list = False
-#                 for final_point in final_points:
-#                     if SimpleLinAlg.four_to_three_dim(final_point) == SimpleLinAlg.four_to_three_dim(point):
-#                         is_in_list = True
-#                         break
-
-#                 if is_point_in_frustum(point, camera) and not is_in_list:
-#                     final_points.append(point)
-
-#     # Corner filling
-#     if len(final_points) - insidePoints == 2 and len(clipped_to_planes) == 2: # If there are exactly 2 final points on the frustum AND they are on different planes
-#         final_points.append(get_frustum_plane_intersection(clipped_to_planes[0], clipped_to_planes[1], camera))
-#         #final_points.append(SimpleLinAlg.intersect_planes(SimpleLinAlg.get_plane_normal(clipped_to_planes[0]), SimpleLinAlg.get_plane_normal(clipped_to_planes[1])))
-
-#     return order_points(final_points)
-
-# def get_frustum_plane_intersection(plane_1, plane_2, camera):
-#     """Given 2 different frustum planes, returns the point that lies on both"""
-#     p1 = Plane(plane_1[0], SimpleLinAlg.get_plane_normal(plane_1))
-#     p2 = Plane(plane_2[0], SimpleLinAlg.get_plane_normal(plane_2))
-
-#     intersection: Line = p1.intersect_plane(p2)
-#     return intersection.to_point()
-
-def find_smallest_distance(point_1, points_and_planes):
+def get_clip_outcodes(points: np.ndarray) -> np.ndarray:
     """
-    Given a point and list of points and planes, return the closest point and its plane
-    """
-    closest_point_and_plane = points_and_planes[0]
-    for intersect_point_and_plane in points_and_planes:
-        # Compare and change closest point and plane
-        if Geometry.distance_3d(point_1, intersect_point_and_plane[0]) < Geometry.distance_3d(point_1, closest_point_and_plane[0]):
-            closest_point_and_plane = intersect_point_and_plane
-    return closest_point_and_plane
-
-def line_seg_frustum_intersections(line_seg: list[list[int]], camera: camera.Camera):
+    Given (n, 4) clip space points, returns an outcode for each one like frustum.Frustum.classify.
+    Bits 0 to 5 are set when a point is outside x >= -w, x <= w, y >= -w, y <= w, z >= -w and z <= w.
     """
-    Given the start and end points on a line segment, returns all the intersection points and planes of the segment for all planes on the frustum
-    """
-    found_points_and_planes = []
-
-    # Check line against each plane
-    for plane in camera.planes:
-        # Get whether the segment intersects and the intersection point
-        does_intersect, intersect_point = line_seg_plane_intersect_info(line_seg, plane)
-
-        if does_intersect and is_point_in_frustum(intersect_point, camera):
-            found_points_and_planes.append([intersect_point, plane])
-    return found_points_and_planes
+    w = points[:, 3:4]
+    distances = np.concatenate([w + points[:, :3], w - points[:, :3]], axis=1)[:, [0, 3, 1, 4, 2, 5]]
+    return (distances < 0) @ (1 << np.arange(6))
 
-def line_seg_plane_intersect_info(line: list[list[float]], plane: list[list[float]]) -> list:
+def clip_polygon(points: list[list[float]]) -> list[list[float]]:
     """
-    Returns a list of [bool, list].
-    The first one is whether or not the line segment intersects a plane.
-    The second one is the intersect point, None if the ENTIRE line doesn't intersect the plane, but otherwise it gives the intersect point of if the line went on forever
-    Works by finding the line plane intersection, then seeing if that point lies on the line segment as well
+    Clips a convex polygon of clip space (x, y, z, w) points to -w <= x, y, z <= w with the Sutherland-Hodgeman algorithm. Returns None if less than a triangle is left.
+    Each bound is a plane through the origin of 4d clip space, so a point's distance to it is just w + or - one coordinate, and a crossing edge is cut by plain linear interpolation.
+    Points stay in order, so the polygon never needs re-sorting. Planes every point is inside are skipped.
     """
-
-    # Get the plane information
-    plane_normal = SimpleLinAlg.get_plane_normal(plane)
-    plane_point = plane[0]
-
-    # Get where the line intersects the plane
-    intersect_point = SimpleLinAlg.get_line_plane_intersect_point(line, plane_point, plane_normal)
-
-    if type(intersect_point) == type(None): # If there is no intersection
-        return [False, None]
-    else:
-        is_point_on_line_seg = Geometry.is_point_on_line_segment(intersect_point, line)
-        return [is_point_on_line_seg, intersect_point]
-    
-def camera_plane_to_name(plane: list[list], my_camera: camera.Camera) -> str:
-    """
-    Given a plane, it will return the name of it
-    """
-    if plane == [
-            [0, 0, my_camera.focal_length],
-            [10, 0, my_camera.focal_length],
-            [0, 10, my_camera.focal_length]
-        ]:
-            return "near_clipping_plane"
-    
-    if plane == [
-            [0, 0, 0],
-            [-my_camera.near_clipping_height/2, 10, my_camera.focal_length],
-            [-my_camera.near_clipping_height/2, -10, my_camera.focal_length]
-        ]:
-            return "left_clipping_plane"
-    
-    if plane == [[0, 0, 0], [my_camera.near_clipping_height/2, -10, my_camera.focal_length], [my_camera.near_clipping_height/2, 10, my_camera.focal_length]]:
-            return "right_clipping_plane"
-    
-    if plane == [
-            [0, 0, 0],
-            [10, my_camera.near_clipping_height/2, my_camera.focal_length],
-            [-10, my_camera.near_clipping_height/2, my_camera.focal_length]
-        ]:
-            return "top_clipping_plane"
-    
-    if plane == [
-            [0, 0, my_camera.focal_length],
-            [10, 0, my_camera.focal_length],
-            [0, 10, my_camera.focal_length]
-        ]:
-            return "near_clipping_plane"
-    if plane == [
-            [0, 0, 0],
-            [-10, -my_camera.near_clipping_height/2, my_camera.focal_length],
-            [10, -my_camera.near_clipping_height/2, my_camera.focal_length]
-        ]:
-        return "bottom_clipping_plane"
-    return "none"
\ No newline at end of file
+    for axis in range(3):
+        for sign in (1, -1):
+            distances = [point[3] + sign * point[axis] for point in points]
+            if min(distances) >= 0:
+                continue
+
+            output_points = []
+            previous_point = points[-1]
+            previous_distance = distances[-1]
+            for point, distance in zip(points, distances):
+                # The edge from the previous point crosses the plane
+                if (distance >= 0) != (previous_distance >= 0):
+                    t = previous_distance / (previous_distance - distance)
+                    output_points.append([previous_point[i] + t * (point[i] - previous_point[i]) for i in range(4)])
+                if distance >= 0:
+                    output_points.append(point)
+                previous_point = point
+                previous_distance = distance
+
+            points = output_points
+            if len(points) < 3:
+                return None
+    return points
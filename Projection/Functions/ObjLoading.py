@@ -0,0 +1,58 @@
+from array import array
+import numpy as np
+from Classes import shapes, mesh
+
+def read_obj(path: str):
+    """
+    Reads a Wavefront .obj file one line at a time, yielding ("v", [x, y, z]) for vertices and ("f", [i, j, k, ...]) for faces.
+    Face indices are turned into 0 based positions in the vertex list (negative indices count back from the last vertex read).
+    Texture coordinates, normals, groups and materials are skipped.
+    """
+    vertex_count = 0
+    with open(path, "r", errors="replace") as file:
+        for line in file:
+            if line.startswith("v "):
+                values = line.split()
+                vertex_count += 1
+                yield "v", [float(values[1]), float(values[2]), float(values[3])]
+            elif line.startswith("f "):
+                face = []
+                for corner in line.split()[1:]:
+                    # Corners can be v, v/vt, v//vn or v/vt/vn
+                    index = int(corner.split("/", 1)[0])
+                    face.append(index - 1 if index > 0 else vertex_count + index)
+                yield "f", face
+
+def triangulate(face: list[int]):
+    """
+    Splits a convex polygon's corner indices into triangles fanning out from the first corner
+    """
+    for i in range(1, len(face) - 1):
+        yield face[0], face[i], face[i + 1]
+
+def load_obj_mesh(path: str, color: tuple = (255, 255, 255)) -> mesh.Mesh:
+    """
+    Loads a .obj file as a mesh.Mesh with one color.
+    Vertices and indices go straight into flat typed arrays as they're read, so big files never exist as lists of Python lists.
+    """
+    vertices = array("d")
+    indices = array("i")
+    for kind, values in read_obj(path):
+        if kind == "v":
+            vertices.extend(values)
+            vertices.append(1)
+        else:
+            for triangle in triangulate(values):
+                indices.extend(triangle)
+
+    vertices = np.frombuffer(vertices, dtype=float).reshape(-1, 4)
+    indices = np.frombuffer(indices, dtype=np.int32).reshape(-1, 3)
+    if len(indices) > 0 and (indices.min() < 0 or indices.max() >= len(vertices)):
+        raise ValueError(f"Face in {path} uses a vertex that doesn't exist")
+    return mesh.Mesh(vertices, indices, color)
+
+def load_obj(path: str, world_pos: tuple = (0, 0, 0), scale: tuple = (1, 1, 1), color: tuple = (255, 255, 255)) -> shapes.Mesh_Object:
+    """
+    Loads a .obj file as an object that can be rendered like any other
+    """
+    return shapes.Mesh_Object(load_obj_mesh(path, color), world_pos, scale)
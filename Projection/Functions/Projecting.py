@@ -1,58 +1,73 @@
-from Classes import camera, shapes
-from Functions import Angles, SimpleLinAlg
+import numpy as np
+from Classes import camera, shapes, buffers, light
 
-def model_triangle_to_view_space(triangle: shapes.Triangle, view_matrix, camera: camera.Camera) -> shapes.Triangle:
+def objects_to_view_space(objects: list[shapes.Object], view_matrix: np.ndarray, buffer_pool: buffers.BufferPool = None, my_light: light.DirectionalLight = None, camera_pos: tuple = None) -> tuple[np.ndarray, np.ndarray]:
     """
-    Converts a triangle object in model space to a triangle object in view space (relative to camera)
+    Converts every triangle of every object into view space in one batch.
+    view_matrix is the camera's combined view matrix (Camera.view_matrix), which includes the camera's rotation.
+    Objects cache their world space vertices until they move, so the only per-frame transform is the view matrix, applied to every vertex at once.
+    Vertices shared between triangles are only transformed once, then the index buffers pick out each triangle's corners.
+    With camera_pos (the camera's world position) given, triangles facing away from it are dropped before anything is gathered, using each object's cached face planes (shapes.Object.get_world_planes).
+    Returns an (n, 3, 4) array of view space triangle points and an (n, 3) array of the triangles' colors, lit by my_light if one is given.
+    The big working arrays come from buffer_pool when one is given, so they can be reused next frame. The returned arrays are only valid until then.
     """
-    view_space_points: list[list[float]] = [] # Will be filled with the view space points
+    if len(objects) == 0:
+        return np.empty((0, 3, 4)), np.empty((0, 3), dtype=np.uint8)
+    if buffer_pool is None:
+        buffer_pool = buffers.BufferPool()
 
-    for point in triangle.points:
-        # Convert to world space
-        world_point: list[float] = SimpleLinAlg.vecMatMul(point, triangle.model_matrix) # FIXME
+    # Every world space vertex of every object as one (n, 4) array
+    vertex_count = sum(len(object.mesh.vertices) for object in objects)
+    vertices = np.concatenate([object.get_world_vertices() for object in objects], out=buffer_pool.get("vertices", (vertex_count, 4)))
+    view_vertices = np.matmul(vertices, view_matrix.T, out=buffer_pool.get("view_vertices", (vertex_count, 4)))
 
-        # Convert to view space
-        view_point: list[float] = SimpleLinAlg.vecMatMul(world_point, view_matrix)
+    # Each mesh's indices, moved past the vertices of the meshes before it
+    triangle_count = sum(len(object.mesh.indices) for object in objects)
+    indices = buffer_pool.get("indices", (triangle_count, 3), np.int32)
+    colors = buffer_pool.get("colors", (triangle_count, 3), np.uint8)
+    if camera_pos is not None:
+        plane_normals = buffer_pool.get("plane_normals", (triangle_count, 3))
+        plane_offsets = buffer_pool.get("plane_offsets", (triangle_count,))
+    vertex_offset = 0
+    triangle_offset = 0
+    for object in objects:
+        object_mesh = object.mesh
+        triangles = slice(triangle_offset, triangle_offset + len(object_mesh.indices))
+        np.add(object_mesh.indices, vertex_offset, out=indices[triangles])
+        colors[triangles] = object_mesh.colors if my_light is None else object.get_shaded_colors(my_light)
+        if camera_pos is not None:
+            plane_normals[triangles], plane_offsets[triangles] = object.get_world_planes()
+        vertex_offset += len(object_mesh.vertices)
+        triangle_offset += len(object_mesh.indices)
 
-        # Rotate with the camera
-        view_point = Angles.rotate_yaw(view_point, camera.yaw)
-        view_point = Angles.rotate_pitch(view_point, camera.pitch)
+    # Back-face culling, before any triangle's corners are gathered
+    if camera_pos is not None:
+        facing = np.flatnonzero(plane_normals @ np.asarray(camera_pos[:3], dtype=float) > plane_offsets)
+        indices = np.take(indices, facing, axis=0, out=buffer_pool.get("facing_indices", (len(facing), 3), np.int32))
+        colors = np.take(colors, facing, axis=0, out=buffer_pool.get("facing_colors", (len(facing), 3), np.uint8))
+        triangle_count = len(facing)
 
-        view_space_points.append(view_point)
-    view_triangle = shapes.Triangle(view_space_points, triangle.color)
+    view_points = np.take(view_vertices, indices, axis=0, out=buffer_pool.get("view_points", (triangle_count, 3, 4)))
+    return view_points, colors
 
-    return view_triangle
-
-def point_to_view_space(point, model_matrix, view_matrix, camera: camera.Camera):
+def project_points(points: np.ndarray, camera: camera.Camera, width, height) -> np.ndarray:
     """
-    Converts a modelspace point into view space given 2 matrices
+    Projects an (n, 3/4) array of view space points in front of the camera onto the screen at once, through the camera's projection matrix.
+    Returns an (n, 2) array of screen points.
     """
+    projection_matrix = camera.projection_matrix
+    clip_points = points[:, :3] @ projection_matrix[:, :3].T + projection_matrix[:, 3]
+    return clip_to_screen(clip_points, width, height)[:, :2]
 
-    world_point = SimpleLinAlg.matmul(model_matrix, point)
-    view_point = SimpleLinAlg.matmul(view_matrix, world_point)
-
-    view_point = Angles.rotate_yaw(view_point, camera.yaw)
-    view_point = Angles.rotate_pitch(view_point, camera.pitch)
-    
-    return view_point
-
-def project(point: list[float], camera: camera.Camera, width, height) -> tuple[float]:
+def clip_to_screen(points: np.ndarray, width, height) -> np.ndarray:
     """
-    Projects a 3 or 4 by 1 point onto a screen with a given width.
-    First projects the point onto the front clipping plane.
-    Then scales that to the screen width and height.
-    Then moves it onto the screen (0, 0 to 600, -600) while invereting the y axis.
+    Does the perspective divide and viewport mapping for an (n, 4) array of clip space points at once.
+    Returns an (n, 3) array of (x, y, 1/z) screen points, with (0, 0) in the top left corner and y going down.
+    w is the view space depth, so 1/w is the 1/z the depth buffer wants.
     """
-    # Project points onto the front clipping plane plane
-    x_proj = (camera.focal_length * point[0])/(point[2])
-    y_proj = (camera.focal_length * point[1])/(point[2])
-
-    # Scale to cover screen
-    x_proj *= width/camera.near_clipping_height
-    y_proj *= -height/camera.near_clipping_height
-
-    # Center to screen
-    x_proj += width/2
-    y_proj += width/2
-
-    return (x_proj, y_proj)
\ No newline at end of file
+    inverse_w = 1 / points[:, 3]
+    screen_points = np.empty((len(points), 3))
+    screen_points[:, 0] = (points[:, 0] * inverse_w + 1) * (width / 2)
+    screen_points[:, 1] = (1 - points[:, 1] * inverse_w) * (height / 2)
+    screen_points[:, 2] = inverse_w
+    return screen_points
@@ -0,0 +1,141 @@
+import numpy as np
+
+# Most pixel fragments (triangle, pixel pairs) rasterized at once, bigger batches are split so memory use stays bounded
+MAX_BATCH_FRAGMENTS = 1 << 20
+
+def clear_buffers(color_buffer: np.ndarray, depth_buffer: np.ndarray, clear_color: tuple = (0, 0, 0)):
+    """
+    Resets a color buffer to the clear color and a depth buffer to infinitely far away (1/z = 0)
+    """
+    if clear_color[0] == clear_color[1] == clear_color[2]:
+        # Filling with one byte is much faster than broadcasting a color
+        color_buffer.fill(clear_color[0])
+    else:
+        color_buffer[:] = clear_color
+    depth_buffer.fill(0)
+
+def fill_triangles(color_buffer: np.ndarray, depth_buffer: np.ndarray, triangles: np.ndarray, colors: np.ndarray, clip_rect: tuple = None):
+    """
+    Fills (n, 3, 3) triangles with their (n, 3) colors into a (width, height, 3) color buffer, only where they are closer than what is already in the (width, height) depth buffer.
+    Triangle points are (x, y, 1/z), where x and y are in pixels and z is the point's view space depth.
+    1/z changes linearly across the screen (z doesn't), so interpolating it gives perspective correct depth.
+    The depth buffer holds 1/z, so bigger values are closer. Where triangles are equally close the first one wins, like drawing them one at a time in order.
+    clip_rect (min_x, min_y, max_x, max_y) limits drawing to part of the buffer, like one screen tile.
+    All the triangles are rasterized at once with numpy, in batches of at most about MAX_BATCH_FRAGMENTS pixels.
+    """
+    if clip_rect is None:
+        clip_rect = (0, 0, *depth_buffer.shape)
+    triangles = np.asarray(triangles, dtype=float).reshape(-1, 3, 3)
+    colors = np.asarray(colors, dtype=np.uint8).reshape(-1, 3)
+
+    # Twice the signed area, 0 means the triangle is a line
+    edge_1 = triangles[:, 1] - triangles[:, 0]
+    edge_2 = triangles[:, 2] - triangles[:, 0]
+    areas = edge_1[:, 0] * edge_2[:, 1] - edge_1[:, 1] * edge_2[:, 0]
+
+    # Pixel bounding rectangles (max exclusive), limited to clip_rect
+    min_x = np.maximum(np.floor(triangles[:, :, 0].min(axis=1)), clip_rect[0])
+    max_x = np.minimum(np.floor(triangles[:, :, 0].max(axis=1)) + 1, clip_rect[2])
+    min_y = np.maximum(np.floor(triangles[:, :, 1].min(axis=1)), clip_rect[1])
+    max_y = np.minimum(np.floor(triangles[:, :, 1].max(axis=1)) + 1, clip_rect[3])
+    keep = np.flatnonzero((areas != 0) & (min_x < max_x) & (min_y < max_y))
+    if len(keep) == 0:
+        return
+    triangles, colors, edge_1, edge_2, areas = triangles[keep], colors[keep], edge_1[keep], edge_2[keep], areas[keep]
+    min_x, max_x, min_y, max_y = (bound[keep].astype(np.int64) for bound in (min_x, max_x, min_y, max_y))
+
+    # 1/z as a plane over the screen: 1/z = w0 + dw_dx * (x - x0) + dw_dy * (y - y0)
+    dw_dx = (edge_1[:, 2] * edge_2[:, 1] - edge_2[:, 2] * edge_1[:, 1]) / areas
+    dw_dy = (edge_2[:, 2] * edge_1[:, 0] - edge_1[:, 2] * edge_2[:, 0]) / areas
+
+    # Triangles are split into batches in draw order, each one depth tests against what the batches before it wrote
+    batch_numbers = np.cumsum((max_x - min_x) * (max_y - min_y)) // MAX_BATCH_FRAGMENTS
+    batch_starts = np.flatnonzero(np.diff(batch_numbers, prepend=-1))
+    for start, end in zip(batch_starts.tolist(), [*batch_starts[1:].tolist(), len(triangles)]):
+        row_triangles, row_y, span_min, span_counts = get_triangle_spans(triangles[start:end], areas[start:end], min_x[start:end], max_x[start:end], min_y[start:end], max_y[start:end])
+        row_triangles += start
+
+        # Depth at x = -0.5 on every row, so a pixel's depth is row_depths + row_steps * x
+        first_points = triangles[row_triangles, 0]
+        row_steps = dw_dx[row_triangles]
+        row_depths = first_points[:, 2] + row_steps * (0.5 - first_points[:, 0]) + dw_dy[row_triangles] * (row_y + 0.5 - first_points[:, 1])
+
+        # Every pixel of every span
+        fragment_rows = np.repeat(np.arange(len(row_triangles)), span_counts)
+        if len(fragment_rows) == 0:
+            continue
+        steps = np.arange(len(fragment_rows)) - np.repeat(np.cumsum(span_counts) - span_counts, span_counts)
+        fragment_x = span_min[fragment_rows] + steps
+        pixels = fragment_x * depth_buffer.shape[1] + row_y[fragment_rows]
+
+        # Worked out from the pixel's x, not by stepping from where the span starts, so clip_rect cutting a span short can't change any pixel's depth
+        inverse_depth = row_depths[fragment_rows] + row_steps[fragment_rows] * fragment_x
+        resolve_fragments(color_buffer, depth_buffer, row_triangles[fragment_rows], pixels, inverse_depth, colors)
+
+def get_triangle_spans(triangles: np.ndarray, areas: np.ndarray, min_x: np.ndarray, max_x: np.ndarray, min_y: np.ndarray, max_y: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Given (n, 3, 2/3) screen triangles, twice their signed areas and their pixel bounding rectangles (max exclusive), finds the pixels whose centers are inside each triangle.
+    Each row of a triangle is a span between where its edges cross the row, so only covered pixels are made.
+    Returns every row's triangle, y, first x and pixel count (0 for rows the triangle misses).
+    """
+    # Every row of every rectangle, as (triangle, y)
+    row_counts = max_y - min_y
+    row_triangles = np.repeat(np.arange(len(triangles)), row_counts)
+    row_y = min_y[row_triangles] + np.arange(len(row_triangles)) - np.repeat(np.cumsum(row_counts) - row_counts, row_counts)
+    center_y = row_y + 0.5
+
+    # Each edge (a to b) keeps the side the third corner is on: sign * ((b.x - a.x) * (y - a.y) - (b.y - a.y) * (x - a.x)) >= 0, a bound on x for the row
+    span_min = min_x[row_triangles].astype(float)
+    span_max = max_x[row_triangles] - 1.0
+    signs = np.sign(areas)[row_triangles]
+    for i in range(3):
+        a = triangles[row_triangles, (i + 1) % 3]
+        b = triangles[row_triangles, (i + 2) % 3]
+        slope = signs * (b[:, 1] - a[:, 1])
+        offset = signs * ((b[:, 0] - a[:, 0]) * (center_y - a[:, 1]) + (b[:, 1] - a[:, 1]) * a[:, 0])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            crossing = offset / slope - 0.5 # In pixels, whose centers are at + 0.5
+        # Horizontal edges bound y instead, the whole row is in or out
+        row_out = (slope == 0) & (offset < 0)
+        span_max = np.where(slope > 0, np.minimum(span_max, np.floor(crossing)), span_max)
+        span_min = np.where(slope < 0, np.maximum(span_min, np.ceil(crossing)), span_min)
+        span_max[row_out] = -1
+        span_min[row_out] = 0
+
+    span_counts = np.maximum(span_max - span_min + 1, 0).astype(np.int64)
+    return row_triangles, row_y, span_min.astype(np.int64), span_counts
+
+def resolve_fragments(color_buffer: np.ndarray, depth_buffer: np.ndarray, fragment_triangles: np.ndarray, pixels: np.ndarray, inverse_depth: np.ndarray, colors: np.ndarray):
+    """
+    Writes the closest fragment of each pixel into the buffers, if it's closer than what's there already.
+    Fragments are (triangle, flat pixel index, 1/z), the lowest numbered triangle wins ties.
+    """
+    # The buffers are contiguous, so these are flat views of them
+    depths = depth_buffer.reshape(-1)
+    previous = depths[pixels]
+    np.maximum.at(depths, pixels, inverse_depth)
+    winners = np.flatnonzero((inverse_depth == depths[pixels]) & (inverse_depth > previous))
+    if len(winners) == 0:
+        return
+
+    # Equally close fragments of the same pixel, keep the first triangle's
+    winner_pixels = pixels[winners]
+    low = winner_pixels.min()
+    first = np.full(winner_pixels.max() + 1 - low, len(colors))
+    np.minimum.at(first, winner_pixels - low, fragment_triangles[winners])
+    winners = winners[fragment_triangles[winners] == first[winner_pixels - low]]
+
+    color_buffer.reshape(-1, 3)[pixels[winners]] = colors[fragment_triangles[winners]]
+
+def polygons_to_triangles(polygons: list[list[tuple]], colors: list[tuple]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Splits convex polygons of ordered (x, y, 1/z) points into fans of triangles.
+    Returns an (n, 3, 3) array of triangles and their (n, 3) colors, in draw order.
+    """
+    triangles = []
+    triangle_colors = []
+    for polygon, color in zip(polygons, colors):
+        for i in range(1, len(polygon) - 1):
+            triangles.append((polygon[0], polygon[i], polygon[i + 1]))
+            triangle_colors.append(color)
+    return np.array(triangles, dtype=float).reshape(-1, 3, 3), np.array(triangle_colors, dtype=np.uint8).reshape(-1, 3)
@@ -0,0 +1,177 @@
+import os
+import json
+import hashlib
+import numpy as np
+from Classes import shapes, mesh, voxels, colliders
+from Functions import ObjLoading
+
+# Bump when the compiled layout changes so old caches get rebuilt
+CACHE_VERSION = 2
+
+# The arrays a compiled scene is made of, each saved as its own .npy file so it can be memory mapped
+CACHE_ARRAYS = ("vertices", "indices", "colors", "normals", "vertex_starts", "index_starts", "positions", "scales", "collider_boxes", "collider_starts")
+
+def load_scene(path: str, cache_dir: str = None) -> list[shapes.Object]:
+    """
+    Loads a scene file and returns its objects as shapes.Mesh_Object.
+    The first load builds every object and saves all their meshes as one compiled set of arrays in cache_dir (default: __scenecache__ next to the scene).
+    Later loads of the same file memory map those arrays instead, so no meshes are built: each object is a Mesh_Object around views of the arrays, with its bounds worked out for every object at once.
+    The cache is keyed by a hash of the scene file and the .obj files it uses, editing any of them makes a new one.
+    """
+    with open(path, "rb") as file:
+        source = file.read()
+    scene = json.loads(source)
+    base_path = os.path.dirname(path)
+
+    key = hashlib.sha256(source + str(CACHE_VERSION).encode())
+    for description in scene["objects"]:
+        if description["type"] == "obj":
+            with open(os.path.join(base_path, description["path"]), "rb") as file:
+                # Hashed in blocks so big meshes aren't read into memory at once
+                for block in iter(lambda: file.read(1 << 20), b""):
+                    key.update(block)
+    key = key.hexdigest()[:16]
+
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), "__scenecache__")
+    compiled_path = os.path.join(cache_dir, os.path.splitext(os.path.basename(path))[0] + "-" + key)
+
+    if not os.path.isdir(compiled_path):
+        compiled = compile_objects(build_objects(scene, base_path))
+        save_compiled(compiled, compiled_path)
+    else:
+        compiled = load_compiled(compiled_path)
+
+    return compiled_to_objects(compiled)
+
+def build_objects(scene: dict, base_path: str = "") -> list[shapes.Object]:
+    """
+    Builds the objects described by a parsed scene file, with file paths relative to base_path.
+    A scene is {"objects": [...]}, each object has a "type" and optionally "position", "scale" and "color":
+        {"type": "cube", "position": [0, 0, 0], "color": [255, 0, 0], "faces": {"top": false}}
+        {"type": "plane"} / {"type": "triangle"}
+        {"type": "voxels", "cells": [[[...]]], "palette": [null, [0, 255, 0]]}
+        {"type": "obj", "path": "teapot.obj"}
+    """
+    objects: list[shapes.Object] = []
+    for description in scene["objects"]:
+        kind = description["type"]
+        position = tuple(description.get("position", (0, 0, 0)))
+        scale = tuple(description.get("scale", (1, 1, 1)))
+        options = {}
+        if "color" in description:
+            options["color"] = tuple(description["color"])
+
+        if kind == "cube":
+            objects.append(shapes.Cube(position, scale, faces=dict(description.get("faces", {})), **options))
+        elif kind == "plane":
+            objects.append(shapes.Plane(position, scale, **options))
+        elif kind == "triangle":
+            objects.append(shapes.Triangle_Object(position, scale, **options))
+        elif kind == "voxels":
+            palette = [None if color is None else tuple(color) for color in description["palette"]]
+            objects.append(voxels.VoxelGrid(description["cells"], palette, world_pos=position))
+        elif kind == "obj":
+            objects.append(ObjLoading.load_obj(os.path.join(base_path, description["path"]), position, scale, **options))
+        else:
+            raise ValueError(f"Unknown object type in scene: {kind!r}")
+    return objects
+
+def compile_objects(objects: list[shapes.Object]) -> dict[str, np.ndarray]:
+    """
+    Packs the model space meshes of a list of objects into a few big arrays.
+    Object i's vertices are vertices[vertex_starts[i]:vertex_starts[i + 1]], its triangles' indices (colors, normals) are indices[index_starts[i]:index_starts[i + 1]].
+    Indices stay relative to the object's own vertices.
+    Object i's colliders are collider_boxes[collider_starts[i]:collider_starts[i + 1]], each as (center x, y, z, scale x, y, z).
+    """
+    meshes = [object.mesh for object in objects]
+    object_colliders = [object.get_colliders() for object in objects]
+    return {
+        "vertices": np.concatenate([np.empty((0, 4))] + [object_mesh.vertices for object_mesh in meshes]),
+        "indices": np.concatenate([np.empty((0, 3), dtype=np.int32)] + [object_mesh.indices for object_mesh in meshes]),
+        "colors": np.concatenate([np.empty((0, 3), dtype=np.uint8)] + [object_mesh.colors for object_mesh in meshes]),
+        "normals": np.concatenate([np.empty((0, 3))] + [object_mesh.normals for object_mesh in meshes]),
+        "vertex_starts": np.cumsum([0] + [len(object_mesh.vertices) for object_mesh in meshes]),
+        "index_starts": np.cumsum([0] + [len(object_mesh) for object_mesh in meshes]),
+        "positions": np.array([object.world_pos[:3] for object in objects], dtype=float).reshape(-1, 3),
+        "scales": np.array([object.scale[:3] for object in objects], dtype=float).reshape(-1, 3),
+        "collider_boxes": np.array([get_collider_box(collider) for box_colliders in object_colliders for collider in box_colliders], dtype=float).reshape(-1, 6),
+        "collider_starts": np.cumsum([0] + [len(box_colliders) for box_colliders in object_colliders])
+    }
+
+def get_collider_box(collider: colliders.BoxCollider) -> tuple:
+    """
+    Returns a collider's center and size
+    """
+    return (
+        (collider.min_x + collider.max_x) / 2, (collider.min_y + collider.max_y) / 2, (collider.min_z + collider.max_z) / 2,
+        collider.max_x - collider.min_x, collider.max_y - collider.min_y, collider.max_z - collider.min_z
+    )
+
+def save_compiled(compiled: dict[str, np.ndarray], compiled_path: str):
+    """
+    Saves compiled arrays as .npy files in a folder.
+    Written to a temporary folder first, so a half written cache is never picked up.
+    """
+    temporary_path = compiled_path + ".tmp" + str(os.getpid())
+    os.makedirs(temporary_path, exist_ok=True)
+    for name in CACHE_ARRAYS:
+        np.save(os.path.join(temporary_path, name + ".npy"), compiled[name])
+    try:
+        os.rename(temporary_path, compiled_path)
+    except OSError: # Another process saved the same scene first
+        for name in CACHE_ARRAYS:
+            os.remove(os.path.join(temporary_path, name + ".npy"))
+        os.rmdir(temporary_path)
+
+def load_compiled(compiled_path: str) -> dict[str, np.ndarray]:
+    """
+    Memory maps the arrays saved by save_compiled. Copy on write, so changing an object's colors doesn't touch the file.
+    """
+    return {name: np.load(os.path.join(compiled_path, name + ".npy"), mmap_mode="c") for name in CACHE_ARRAYS}
+
+def compiled_to_objects(compiled: dict[str, np.ndarray]) -> list[shapes.Object]:
+    """
+    Makes a shapes.Mesh_Object for every object in compiled arrays, their meshes are views into the arrays
+    """
+    # Plain array views of the memory maps, slicing np.memmap itself is a lot slower
+    compiled = {name: np.asarray(array) for name, array in compiled.items()}
+    vertex_starts = compiled["vertex_starts"].tolist()
+    index_starts = compiled["index_starts"].tolist()
+    collider_starts = compiled["collider_starts"].tolist()
+    collider_boxes = compiled["collider_boxes"].tolist()
+    bounds_min, bounds_max = get_compiled_bounds(compiled)
+    bounding_centers = (bounds_min + bounds_max) / 2
+    bounding_radii = (np.linalg.norm(bounds_max - bounds_min, axis=1) / 2).tolist()
+
+    objects: list[shapes.Object] = []
+    for i, (position, scale) in enumerate(zip(compiled["positions"].tolist(), compiled["scales"].tolist())):
+        vertices = compiled["vertices"][vertex_starts[i]:vertex_starts[i + 1]]
+        triangles = slice(index_starts[i], index_starts[i + 1])
+        object_mesh = mesh.Mesh(vertices, compiled["indices"][triangles], compiled["colors"][triangles], compiled["normals"][triangles])
+        box_colliders = [colliders.BoxCollider(box[:3], box[3:]) for box in collider_boxes[collider_starts[i]:collider_starts[i + 1]]]
+        objects.append(shapes.Mesh_Object(object_mesh, tuple(position), tuple(scale), box_colliders=box_colliders, bounds=(bounds_min[i], bounds_max[i], bounding_centers[i], bounding_radii[i])))
+    return objects
+
+def get_compiled_bounds(compiled: dict[str, np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns every compiled object's (n, 3) world space bounding box, the same as shapes.Object.update_bounds gives, for all of them at once.
+    Model matrices are only a scale and a translation, so the model space box just needs scaling and moving.
+    """
+    vertex_starts = compiled["vertex_starts"]
+    positions = compiled["positions"]
+    scales = compiled["scales"]
+
+    # Objects without vertices are a point at their position
+    model_min = np.zeros_like(positions)
+    model_max = np.zeros_like(positions)
+    has_vertices = np.flatnonzero(vertex_starts[1:] > vertex_starts[:-1])
+    if len(has_vertices) > 0:
+        points = compiled["vertices"][:, :3]
+        model_min[has_vertices] = np.minimum.reduceat(points, vertex_starts[has_vertices], axis=0)
+        model_max[has_vertices] = np.maximum.reduceat(points, vertex_starts[has_vertices], axis=0)
+
+    # A negative scale swaps which corner is the min
+    corner_1 = model_min * scales + positions
+    corner_2 = model_max * scales + positions
+    return np.minimum(corner_1, corner_2), np.maximum(corner_1, corner_2)
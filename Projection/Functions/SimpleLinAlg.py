@@ -86,11 +86,10 @@ def four_to_three_dim(point):
 
 def four_to_three_dim_list(points):
     """
-    Given a list of points each with dimensions 4 x 1, returns them as 3x1s
+    Given a list of points each with dimensions 4 x 1, returns them as 3x1s.
+    Doesn't change the given list.
     """
-    for i, point in enumerate(points):
-        points[i] = point[0], point[1], point[2]
-    return points
+    return [(point[0], point[1], point[2]) for point in points]
 
 def is_point_on_plane(point: list[float], plane_point: list[float], plane_normal: list[float]) -> bool:
     """
@@ -104,17 +103,15 @@ def is_point_on_plane(point: list[float], plane_point: list[float], plane_normal
 
 def get_plane_normal(plane: list[list[float]]):
     """
-    Given three points on a plane, returns the normal of that plane
+    Given three 3/4x1 points on a plane, returns the normal of that plane.
+    Doesn't change the given points.
     """
-    if len(plane[0]) > 3:
-        plane[0] = four_to_three_dim(plane[0])
-    if len(plane[1]) > 3:
-        plane[1] = four_to_three_dim(plane[1])
-    if len(plane[2]) > 3:
-        plane[2] = four_to_three_dim(plane[2])
-
-    vector_1 = vecSub(plane[0], plane[1])
-    vector_2 = vecSub(plane[0], plane[2])
+    a = four_to_three_dim(plane[0])
+    b = four_to_three_dim(plane[1])
+    c = four_to_three_dim(plane[2])
+
+    vector_1 = vecSub(a, b)
+    vector_2 = vecSub(a, c)
     normal = cross(vector_1, vector_2)
     normal = normalize_vector(normal)
     return normal
@@ -0,0 +1,180 @@
+"""
+Renders standard scenes along a scripted camera path without opening a window and reports frame time stats.
+Run from the Projection folder, e.g.
+    python benchmark.py
+    python benchmark.py --scene grid_1k --frames 50
+    python benchmark.py --obj bunny.obj
+"""
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy") # Don't open a window
+
+import argparse
+import pygame
+import numpy as np
+from math import pi, sin, cos
+from Classes import camera, shapes, renderer, bvh, voxels, profiler, mesh
+from Functions import ObjLoading
+
+def single_cube_scene() -> tuple[list[shapes.Object], list[tuple]]:
+    """One cube, with the camera circling it"""
+    objects = [shapes.Cube(world_pos=(0, 0, 0), color=(0, 255, 0))]
+    return objects, orbit_path((0, 0, 0), 3, 1)
+
+def cube_grid_scene(side: int) -> tuple[list[shapes.Object], list[tuple]]:
+    """A flat side x side grid of cubes, with the camera flying over it"""
+    objects = []
+    for x in range(side):
+        for z in range(side):
+            color = (0, 255, 0) if (x + z) % 2 == 0 else (150, 75, 0)
+            objects.append(shapes.Cube(world_pos=(x - side / 2, 0, z - side / 2), color=color))
+    return objects, fly_over_path(side)
+
+def voxel_grid_scene(side: int) -> tuple[list[shapes.Object], list[tuple]]:
+    """The same flat side x side grid of blocks as cube_grid_scene, built as one greedy meshed voxels.VoxelGrid, colored in 10x10 patches"""
+    cells = [[[1 + (x // 10 + z // 10) % 2 for z in range(side)] for y in range(1)] for x in range(side)]
+    objects = [voxels.VoxelGrid(cells, [None, (0, 255, 0), (150, 75, 0)], world_pos=(-side / 2, 0, -side / 2))]
+    return objects, fly_over_path(side)
+
+def near_plane_scene() -> tuple[list[shapes.Object], list[tuple]]:
+    """The camera turns around inside a tight cluster of cubes so most triangles have to be clipped by the near plane"""
+    objects = []
+    for x in range(-2, 3):
+        for y in range(-2, 3):
+            for z in range(-2, 3):
+                if (x, y, z) != (0, 0, 0):
+                    objects.append(shapes.Cube(world_pos=(x * 1.1, y * 1.1, z * 1.1), scale=(0.9, 0.9, 0.9), color=(128, 0, 128)))
+    return objects, orbit_path((0, 0, 0), 0.05, 0)
+
+def cube_block_scene(side: int) -> tuple[list[shapes.Object], list[tuple]]:
+    """A solid side x side x side block of cubes, with the camera circling it so most cubes are hidden behind the outer ones"""
+    objects = []
+    for x in range(side):
+        for y in range(side):
+            for z in range(side):
+                color = (0, 255, 0) if (x + y + z) % 2 == 0 else (150, 75, 0)
+                objects.append(shapes.Cube(world_pos=(x - side / 2, y - side / 2, z - side / 2), color=color))
+    return objects, orbit_path((0, 0, 0), side * 1.5, side * 0.5)
+
+def sphere_mesh(rings: int, segments: int, color: tuple) -> mesh.Mesh:
+    """A unit UV sphere with rings x segments quads, wound so the faces point out"""
+    theta = np.linspace(0, pi, rings + 1)[:, np.newaxis]
+    phi = np.linspace(0, 2 * pi, segments + 1)[np.newaxis, :]
+    vertices = np.stack([np.sin(theta) * np.cos(phi), np.cos(theta) * np.ones_like(phi), np.sin(theta) * np.sin(phi), np.ones((rings + 1, segments + 1))], axis=2).reshape(-1, 4)
+
+    row, column = np.meshgrid(np.arange(rings), np.arange(segments), indexing="ij")
+    corner = (row * (segments + 1) + column).reshape(-1)
+    below = corner + segments + 1
+    indices = np.concatenate([np.stack([corner, below, corner + 1], axis=1), np.stack([below, below + 1, corner + 1], axis=1)])
+    return mesh.Mesh(vertices, indices, color)
+
+def far_spheres_scene(side: int) -> tuple[list[shapes.Object], list[tuple]]:
+    """A side x side field of detailed spheres with simplified levels of detail, with the camera flying over it so most of them are far away"""
+    objects = []
+    for x in range(side):
+        for z in range(side):
+            color = (200, 200, 200) if (x + z) % 2 == 0 else (200, 60, 60)
+            sphere = shapes.Mesh_Object(sphere_mesh(24, 48, color), world_pos=(6 * x - 3 * side, 0, 6 * z - 3 * side), scale=(1, 1, 1))
+            sphere.generate_lods()
+            objects.append(sphere)
+    return objects, fly_over_path(6 * side)
+
+def obj_scene(path: str) -> tuple[list[shapes.Object], list[tuple]]:
+    """A mesh loaded from a .obj file, with the camera circling it far enough away to see all of it"""
+    objects = [ObjLoading.load_obj(path, color=(200, 200, 200))]
+    size = max(float((objects[0].bounds_max - objects[0].bounds_min).max()), 0.001)
+    return objects, orbit_path(tuple(objects[0].bounding_center), size * 1.5, size * 0.5)
+
+SCENES = {
+    "single_cube": single_cube_scene,
+    "grid_1k": lambda: cube_grid_scene(32),
+    "grid_10k": lambda: cube_grid_scene(100),
+    "voxels_10k": lambda: voxel_grid_scene(100),
+    "near_plane": near_plane_scene,
+    "far_spheres": lambda: far_spheres_scene(12),
+    "cube_block": lambda: cube_block_scene(16),
+}
+
+def orbit_path(center: tuple, radius: float, height: float, frames: int = 360) -> list[tuple]:
+    """Camera poses (world_pos, yaw, pitch) going once around a point while looking at it"""
+    path = []
+    for i in range(frames):
+        angle = 2 * pi * i / frames
+        world_pos = (center[0] + radius * sin(angle), center[1] + height, center[2] - radius * cos(angle))
+        path.append((world_pos, -angle, -0.2 if height > 0 else 0))
+    return path
+
+def fly_over_path(side: int, frames: int = 360) -> list[tuple]:
+    """Camera poses (world_pos, yaw, pitch) moving across a grid of cubes while slowly turning"""
+    path = []
+    for i in range(frames):
+        t = i / frames
+        world_pos = (0, 3, -side / 2 + t * side)
+        path.append((world_pos, 2 * pi * t, -0.4))
+    return path
+
+def percentile(values: list[float], percent: float) -> float:
+    """Nearest rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def run_scene(name: str, frames: int, width: int, height: int, use_bvh: bool = False, **renderer_options) -> dict:
+    """Renders the first few frames of a scene's camera path and returns its stats"""
+    objects, camera_path = SCENES[name]()
+    scene = bvh.BVH(objects) if use_bvh else objects
+    camera_path = [camera_path[i % len(camera_path)] for i in range(frames)]
+
+    my_camera = camera.Camera((0, 0, 0), 0.000001, pi/2, 2, 0.5, 0.001)
+    surface = pygame.Surface((width, height))
+    frame_times, triangles_drawn = renderer.render_camera_path(scene, my_camera, camera_path, surface, **renderer_options)
+
+    scene_triangles = sum(len(object.lod_meshes[0]) for object in objects)
+    total_time = sum(frame_times)
+    return {
+        "scene": name,
+        "frames": frames,
+        "triangles": scene_triangles,
+        "p50_ms": percentile(frame_times, 50) * 1000,
+        "p90_ms": percentile(frame_times, 90) * 1000,
+        "p99_ms": percentile(frame_times, 99) * 1000,
+        "mean_ms": total_time / frames * 1000,
+        "triangles_per_sec": scene_triangles * frames / total_time,
+        "drawn_per_sec": sum(triangles_drawn) / total_time,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Frame time benchmark for the renderer")
+    parser.add_argument("--scene", choices=list(SCENES), action="append", help="Scene to run, can be given more than once (default: all)")
+    parser.add_argument("--frames", type=int, default=20, help="Frames to render per scene")
+    parser.add_argument("--width", type=int, default=600)
+    parser.add_argument("--height", type=int, default=600)
+    parser.add_argument("--depth-buffer", action="store_true", help="Rasterize with a depth buffer instead of sorting triangles")
+    parser.add_argument("--bvh", action="store_true", help="Cull objects with a bounding volume hierarchy")
+    parser.add_argument("--pipelined", action="store_true", help="Overlap each frame's geometry with the previous frame's drawing")
+    parser.add_argument("--trace", help="Time each renderer stage, print the averages and save a Chrome trace of the run to this file")
+    parser.add_argument("--workers", type=int, default=0, help="Rasterize screen tiles in this many processes (uses the depth buffer)")
+    parser.add_argument("--occlusion", action="store_true", help="Skip objects hidden behind the biggest objects on screen")
+    parser.add_argument("--no-lod", action="store_true", help="Always draw every object's full detail mesh")
+    parser.add_argument("--obj", action="append", default=[], help=".obj file to run as a scene, can be given more than once")
+    args = parser.parse_args()
+
+    names = args.scene or ([] if args.obj else list(SCENES))
+    for path in args.obj:
+        name = os.path.splitext(os.path.basename(path))[0]
+        SCENES[name] = lambda path=path: obj_scene(path)
+        names.append(name)
+
+    print(f"{'scene':<12} {'frames':>6} {'tris':>8} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'mean ms':>9} {'tris/s':>11} {'drawn/s':>11}")
+    my_profiler = profiler.Profiler(enabled=args.trace is not None, history=args.frames * len(names))
+    for name in names:
+        stats = run_scene(name, args.frames, args.width, args.height, use_bvh=args.bvh, depth_buffer=args.depth_buffer, workers=args.workers, pipelined=args.pipelined, my_profiler=my_profiler, level_of_detail=not args.no_lod, occlusion_culling=args.occlusion)
+        print(f"{stats['scene']:<12} {stats['frames']:>6} {stats['triangles']:>8} {stats['p50_ms']:>9.2f} {stats['p90_ms']:>9.2f} {stats['p99_ms']:>9.2f} {stats['mean_ms']:>9.2f} {stats['triangles_per_sec']:>11.0f} {stats['drawn_per_sec']:>11.0f}")
+
+    if args.trace is not None:
+        print()
+        for stage, seconds in my_profiler.get_stage_times(len(my_profiler.frames)).items():
+            print(f"{stage:<12} {seconds * 1000:>9.2f} ms")
+        my_profiler.export_chrome_trace(args.trace)
+
+if __name__ == "__main__":
+    main()